@@ -1,10 +1,25 @@
 #!/usr/bin/env python3
 
 import argparse
+import concurrent.futures
+import csv
 import datetime
+import functools
+import glob
+import gzip
+import hashlib
+import http.client
+import io
 import json
+import os
+import random
 import sys
-import urllib.request
+import threading
+import time
+import urllib.error
+import urllib.parse
+
+import archive
 
 try:
     import config
@@ -16,21 +31,65 @@ except:
     raise
 
 
-BASE_URL = "https://cloud.alphaess.com/api/base/"
+# config.base_url is optional, for pointing at a stand-in like mockserver.py
+BASE_URL = getattr(config, "base_url", "https://cloud.alphaess.com/api/base/")
+
+
+# Each thread keeps its own connection to BASE_URL alive between requests.
+_local = threading.local()
+
+
+def _connection(url):
+    key = (url.scheme, url.netloc)
+    if getattr(_local, "key", None) != key:
+        if getattr(_local, "conn", None) is not None:
+            _local.conn.close()
+        if url.scheme == "https":
+            _local.conn = http.client.HTTPSConnection(url.netloc, timeout=30)
+        else:
+            _local.conn = http.client.HTTPConnection(url.netloc, timeout=30)
+        _local.key = key
+    return _local.conn
 
 
 def request(url_suffix):
-    url = BASE_URL + url_suffix
-    req = urllib.request.Request(
-        url,
-        headers={
-            "Authority": "cloud.alphaess.com",
-            "Authorization": config.auth_jwt,
-            "Accept": "application/json",
-            "Referer": "https://cloud.alphaess.com/index/index",
-        },
-    )
-    return urllib.request.urlopen(req)
+    """
+    GET `url_suffix` under BASE_URL, returning the body as a file.
+
+    Like `urllib.request.urlopen`, raises `urllib.error.HTTPError` for
+    an HTTP error status and `urllib.error.URLError` if the request
+    couldn't be made.  A connection which the server has since closed
+    is reopened once.
+    """
+    url = urllib.parse.urlsplit(BASE_URL + url_suffix)
+    path = url.path + ("?" + url.query if url.query else "")
+    headers = {
+        "Authority": "cloud.alphaess.com",
+        "Authorization": config.auth_jwt,
+        "Accept": "application/json",
+        "Accept-Encoding": "gzip",
+        "Referer": "https://cloud.alphaess.com/index/index",
+    }
+
+    for attempt in range(2):
+        conn = _connection(url)
+        try:
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            body = resp.read()
+            break
+        except (http.client.HTTPException, OSError) as e:
+            conn.close()
+            if attempt == 1:
+                raise urllib.error.URLError(e) from e
+
+    if resp.getheader("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    if resp.status >= 400:
+        raise urllib.error.HTTPError(
+            url.geturl(), resp.status, resp.reason, resp.headers, io.BytesIO(body)
+        )
+    return io.BytesIO(body)
 
 
 def direction(num, inward, nil, outward):
@@ -42,9 +101,13 @@ def direction(num, inward, nil, outward):
         return outward
 
 
-def get_last_power(opts):
+def fetch_last_power():
     resp = request(f"energyStorage/getLastPowerData?sysSn={config.serial}&stationId=")
-    js = json.load(resp)
+    return json.load(resp)
+
+
+def get_last_power(opts):
+    js = fetch_last_power()
     data = js["data"]
 
     batstate = direction(data["pbat"], "charging", "", "discharging")
@@ -65,40 +128,51 @@ Battery charge: {data['soc']:g}%
         )
 
 
+def fetch_daily_power_histogram(date):
+    resp = request(f"power/staticsByDay?date={date}&userId=&sysSn={config.serial}")
+    return json.load(resp)
+
+
 def get_daily_power_histogram(opts, output=sys.stdout):
-    resp = request(f"power/staticsByDay?date={opts.date}&userId=&sysSn={config.serial}")
-    js = json.load(resp)
+    js = fetch_daily_power_histogram(opts.date)
 
     _output_histogram(opts, js, output=output)
 
 
+HISTOGRAM_HEADINGS = [
+    "Time",
+    "Battery %",
+    "Solar W",
+    "Export W",
+    "Import W",
+    "Home Usage W",
+]
+
+
+def _histogram_rows(data):
+    def W(kw):
+        return "%g" % (kw * 1000)
+
+    return [
+        [time, "%g%%" % cbat, W(ppv), W(feed_in), W(grid_charge), W(home)]
+        for time, cbat, ppv, feed_in, grid_charge, home in zip(
+            data["time"],
+            data["cbat"],
+            data["ppv"],
+            data["feedIn"],
+            data["gridCharge"],
+            data["homePower"],
+        )
+    ]
+
+
 def _output_histogram(opts, js, output=sys.stdout):
     data = js["data"]
 
     def _table(sep, output):
-        def W(kw):
-            return "%g" % (kw * 1000)
-
-        print(
-            sep.join(
-                ["Time", "Battery %", "Solar W", "Export W", "Import W", "Home Usage W"]
-            ),
-            file=output,
-        )
-        for i, time in enumerate(data["time"]):
-            print(
-                sep.join(
-                    [
-                        time,
-                        "%g%%" % data["cbat"][i],
-                        W(data["ppv"][i]),
-                        W(data["feedIn"][i]),
-                        W(data["gridCharge"][i]),
-                        W(data["homePower"][i]),
-                    ]
-                ),
-                file=output,
-            )
+        w = csv.writer(output, delimiter=sep, lineterminator="\n")
+        w.writerow(HISTOGRAM_HEADINGS)
+        w.writerows(_histogram_rows(data))
 
     if opts.format == "json":
         print(json.dumps(js), file=output)
@@ -123,9 +197,421 @@ Total usage:   {data['eload']:g}kWh
         _table(",", output)
 
 
+EXTENSIONS = dict(json=".json", text=".txt", csv=".csv")
+
+
+def _format_file(fn, format, output_dir, concat):
+    """
+    Convert `fn` into `format` in `output_dir`, if given; and return its
+    rows, each preceded by the date in its name, as CSV if `concat`.
+    """
+    with open(fn) as f:
+        js = json.load(f)
+    date = os.path.splitext(os.path.basename(fn))[0]
+
+    if output_dir:
+        buf = io.StringIO()
+        _output_histogram(argparse.Namespace(format=format), js, output=buf)
+        with open(os.path.join(output_dir, date + EXTENSIONS[format]), "w") as f:
+            f.write(buf.getvalue())
+
+    if concat:
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerows(
+            [date] + row for row in _histogram_rows(js["data"])
+        )
+        return buf.getvalue()
+
+
 def format_daily_power_histogram(opts):
-    js = json.load(opts.file)
-    _output_histogram(opts, js)
+    if not (opts.output_dir or opts.concat):
+        # just the one file, to stdout
+        (fn,) = opts.paths
+        with sys.stdin if fn == "-" else open(fn) as f:
+            js = json.load(f)
+        _output_histogram(opts, js)
+        return
+
+    files = sorted(
+        set(json_files(fn for p in opts.paths for fn in sorted(glob.glob(p)) or [p])),
+        key=lambda fn: os.path.basename(fn),
+    )
+    if opts.output_dir:
+        os.makedirs(opts.output_dir, exist_ok=True)
+    concat = None
+    if opts.concat:
+        concat = sys.stdout if opts.concat == "-" else open(opts.concat, "w")
+        csv.writer(concat, lineterminator="\n").writerow(["Date"] + HISTOGRAM_HEADINGS)
+
+    work = functools.partial(
+        _format_file,
+        format=opts.format,
+        output_dir=opts.output_dir,
+        concat=bool(concat),
+    )
+    with concurrent.futures.ProcessPoolExecutor(opts.jobs) as pool:
+        # in order of date, so the concatenation comes out sorted
+        for rows in pool.map(work, files, chunksize=16):
+            if concat:
+                concat.write(rows)
+    if concat and concat is not sys.stdout:
+        concat.close()
+
+
+# Requests per second fetch-range starts at, and won't exceed.  The API's
+# limits aren't documented, so it backs off from here when told to.
+DEFAULT_RATE = 5.0
+
+
+class TokenBucket:
+    """
+    Allows an average of `rate` calls to `take` per second, in bursts of
+    up to `burst`.  Safe to share between threads.
+
+    The rate adapts to the server: `throttled` halves it (down to
+    `min_rate`) and `succeeded` wins it back gradually, up to where it
+    started.  A Retry-After given to `throttled` holds back every call
+    until it has passed.
+    """
+
+    def __init__(self, rate, burst=1, min_rate=0.05):
+        self.rate = self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+        self.hold = self.last
+        self.lock = threading.Lock()
+
+    def take(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.hold:
+                    wait = self.hold - now
+                else:
+                    elapsed = now - max(self.last, self.hold)
+                    self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+                    self.last = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self, retry_after=None):
+        """
+        Note that a call was refused for going too fast (HTTP 429), and
+        that the server asked for no more for `retry_after` seconds.
+        """
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            if retry_after:
+                self.hold = max(self.hold, time.monotonic() + retry_after)
+
+    def succeeded(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+def with_retries(fn, bucket, retries=6, backoff=2.0):
+    """
+    Call `fn` once `bucket` allows, retrying with exponential backoff
+    (and jitter) when the API says it is overloaded or failing: HTTP 429
+    or 5xx, or a dropped connection.  A Retry-After header is obeyed.
+    A 429 instead slows `bucket` down, and holds it for its Retry-After,
+    for every caller; the retry just waits its turn from `bucket`.
+    """
+    for attempt in range(retries + 1):
+        bucket.take()
+        try:
+            result = fn()
+        except urllib.error.HTTPError as e:
+            if attempt == retries or not (e.code == 429 or e.code >= 500):
+                raise
+            delay = e.headers.get("Retry-After")
+            delay = float(delay) if delay and delay.isdigit() else None
+            if e.code == 429:
+                bucket.throttled(delay)
+                continue
+        except (urllib.error.URLError, ConnectionError):
+            if attempt == retries:
+                raise
+            delay = None
+        else:
+            bucket.succeeded()
+            return result
+        if delay is None:
+            delay = backoff * 2**attempt * random.uniform(0.5, 1.5)
+        time.sleep(delay)
+
+
+def day_filename(out_dir, d):
+    return os.path.join(
+        out_dir, "%d" % d.year, "%d-%02d-%02d.json" % (d.year, d.month, d.day)
+    )
+
+
+# Records, per date, when its file was fetched, the SHA-256 of its
+# contents, whether it covered the whole day, and whether it was the same
+# as the time before.
+MANIFEST = "manifest.json"
+
+# Minutes past midnight of each of a day's 288 samples.
+SLOTS = frozenset(range(0, 24 * 60, 5))
+
+# Data can still be uploaded for a while after the day ends, so a day
+# fetched sooner than this many hours after is fetched again, until it
+# comes back unchanged.
+SETTLE_HOURS = 24
+
+
+def day_complete(js):
+    """
+    True if the day's `time` array has every one of its 5-minute slots;
+    a day fetched before it ended (or before the data was all uploaded)
+    lacks some.
+    """
+    times = (js.get("data") or {}).get("time") or []
+    try:
+        return SLOTS.issubset(map(archive.time_minutes, times))
+    except (AttributeError, ValueError):
+        return False
+
+
+def day_settled(date, entry):
+    """
+    True if the day `date` ("YYYY-MM-DD"), whose manifest entry is
+    `entry`, needn't be fetched again: it was fetched SETTLE_HOURS after
+    it ended, or after it ended and unchanged from the fetch before.
+    Whether it was complete doesn't matter, so days that never will be
+    (no data, outages, clock changes) aren't fetched forever.
+    """
+    if not entry:
+        return False
+    end = datetime.datetime.combine(
+        datetime.date.fromisoformat(date) + datetime.timedelta(days=1),
+        datetime.time(),
+    ).timestamp()
+    if entry["fetched"] >= end + SETTLE_HOURS * 3600:
+        return True
+    # today is often unchanged between two quick runs
+    return entry.get("unchanged", False) and entry["fetched"] >= end
+
+
+def _manifest_entry(body, js, fetched, previous=None):
+    sha256 = hashlib.sha256(body).hexdigest()
+    return dict(
+        fetched=fetched,
+        sha256=sha256,
+        complete=day_complete(js),
+        unchanged=previous is not None and previous["sha256"] == sha256,
+    )
+
+
+def save_manifest(out_dir, manifest):
+    filename = os.path.join(out_dir, MANIFEST)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(filename + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=0, sort_keys=True)
+    os.replace(filename + ".tmp", filename)
+
+
+def load_manifest(out_dir):
+    """
+    Return the manifest for `out_dir`, first making one from the files
+    already there if it has none.
+    """
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+
+    manifest = {}
+    for filename in glob.glob(os.path.join(glob.escape(out_dir), "*", "*.json")):
+        with open(filename, "rb") as f:
+            body = f.read()
+        try:
+            js = json.loads(body)
+        except ValueError:
+            continue
+        date = os.path.splitext(os.path.basename(filename))[0]
+        manifest[date] = _manifest_entry(body, js, os.path.getmtime(filename))
+    save_manifest(out_dir, manifest)
+    return manifest
+
+
+def fetch_day(d, out_dir, bucket, previous=None):
+    """
+    Fetch the daily power histogram for `d` into its file under
+    `out_dir`, written atomically so an interrupted fetch leaves
+    nothing behind.  Returns its manifest entry, given the `previous`
+    one.
+    """
+    js = with_retries(lambda: fetch_daily_power_histogram(d), bucket)
+    body = (json.dumps(js) + "\n").encode()
+
+    filename = day_filename(out_dir, d)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    tmp = filename + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(body)
+    os.replace(tmp, filename)
+    return _manifest_entry(body, js, time.time(), previous)
+
+
+def fetch_range(opts):
+    manifest = load_manifest(opts.output)
+    days = []
+    settled = 0
+    d = opts.start
+    while d <= opts.end:
+        if day_settled(str(d), manifest.get(str(d))):
+            settled += 1
+        else:
+            days.append(d)
+        d += datetime.timedelta(days=1)
+    if settled:
+        print("Already have", settled, "days")
+
+    bucket = TokenBucket(opts.rate, opts.burst)
+    failed = 0
+    with concurrent.futures.ThreadPoolExecutor(opts.jobs) as pool:
+        futures = {
+            pool.submit(fetch_day, d, opts.output, bucket, manifest.get(str(d))): d
+            for d in days
+        }
+        for future in concurrent.futures.as_completed(futures):
+            d = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                print("Failed", d, e, file=sys.stderr, flush=True)
+                failed += 1
+                continue
+            previous = manifest.get(str(d))
+            manifest[str(d)] = entry
+            save_manifest(opts.output, manifest)
+            notes = [] if entry["complete"] else ["incomplete"]
+            if previous:
+                notes.append("unchanged" if entry["unchanged"] else "changed")
+            print("Fetched", d, *(f"({n})" for n in notes), flush=True)
+
+    if failed:
+        sys.exit(f"{failed} of {len(days)} days failed")
+
+
+def json_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.endswith(".json") and name != MANIFEST:
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def ingest(opts):
+    db = archive.connect(opts.db)
+    added, replaced = archive.ingest(db, config.serial, json_files(opts.paths))
+    print(f"Added {len(added)} days to {opts.db}, and replaced {len(replaced)}")
+
+
+def query(opts):
+    db = archive.connect(opts.db)
+    if opts.days:
+        heads = ["date"] + [c for _, c in archive.DAY_FIELDS]
+        rows = archive.days(db, config.serial, opts.start, opts.end)
+    else:
+        heads = ["time"] + [c for _, c in archive.SAMPLE_FIELDS]
+        rows = archive.samples(db, config.serial, opts.start, opts.end)
+
+    def missing(v):
+        # the archive has NaN where the API gave null
+        return v is None or v != v
+
+    if opts.format == "json":
+        print(
+            json.dumps(
+                [
+                    {h: None if missing(v) else v for h, v in zip(heads, row)}
+                    for row in rows
+                ]
+            )
+        )
+    else:
+        sep = "," if opts.format == "csv" else "\t"
+
+        def cell(v):
+            if missing(v):
+                return ""
+            return "%g" % v if isinstance(v, float) else v
+
+        sys.stdout.write(sep.join(heads) + "\n")
+        sys.stdout.writelines(sep.join(map(cell, row)) + "\n" for row in rows)
+
+
+def analyze(opts):
+    # NumPy is only needed here
+    import analysis
+
+    db = archive.connect(opts.db)
+    dates, grid = analysis.load(db, config.serial, opts.start, opts.end)
+    if not dates:
+        sys.exit(f"No archived days from {opts.start} to {opts.end}: see `ingest`")
+    result = analysis.analyze(dates, grid)
+    hourly = result["hourly"]
+    peaks = result["peak_usage_kw"]
+
+    def pct(ratio):
+        return "-" if ratio is None else "%.1f%%" % (ratio * 100)
+
+    def kw(peak):
+        # None when no day had any usage recorded
+        return "n/a" if peak is None else "%gkW" % peak
+
+    if opts.format == "json":
+        print(json.dumps(result))
+    elif opts.format == "text":
+        print(
+            f"""
+Days:  {result['days']} ({result['first']} to {result['last']})
+
+Total solar:   {result['solar_kwh']:.1f}kWh
+Total export:  {result['export_kwh']:.1f}kWh
+Total import:  {result['import_kwh']:.1f}kWh
+Total usage:   {result['usage_kwh']:.1f}kWh
+
+Self-consumption:  {pct(result['self_consumption'])}
+Self-sufficiency:  {pct(result['self_sufficiency'])}
+Battery cycles:    {result['battery_cycles']:.1f}
+
+Daily peak usage:  P50 {kw(peaks['p50'])}, P90 {kw(peaks['p90'])}, P99 {kw(peaks['p99'])}, max {kw(peaks['max'])}
+"""
+        )
+        print(
+            "Hour\tImport kWh/day\tExport kWh/day\tSolar kWh/day\tUsage kWh/day\tPeak days"
+        )
+        for row in zip(*hourly.values()):
+            print("%02d:00\t%.3f\t%.3f\t%.3f\t%.3f\t%d" % row)
+    elif opts.format == "csv":
+        print(
+            "Hour,Import kWh/day,Export kWh/day,Solar kWh/day,Usage kWh/day,Peak days"
+        )
+        for row in zip(*hourly.values()):
+            print("%02d:00,%g,%g,%g,%g,%d" % row)
+
+
+def run_daemon(opts):
+    import daemon
+
+    daemon.run(lambda: fetch_last_power()["data"], opts)
+
+
+def parse_date(s):
+    return datetime.datetime.strptime(s, "%Y-%m-%d").date()
 
 
 if __name__ == "__main__":
@@ -139,23 +625,139 @@ if __name__ == "__main__":
     )
     cp.set_defaults(func=get_last_power)
 
+    cp = subp.add_parser(
+        "daemon",
+        help="Keep polling getLastPowerData, logging every sample and serving the latest (/latest) and recent ones (/history) as JSON over HTTP.",
+    )
+    cp.add_argument("--host", default="127.0.0.1", help="Default 127.0.0.1.")
+    cp.add_argument("--port", type=int, default=8086, help="Default 8086.")
+    cp.add_argument(
+        "--log",
+        default="last-power.jsonl",
+        help="Append samples to this file, and fill the history from it at startup (default last-power.jsonl).",
+    )
+    cp.add_argument(
+        "--size",
+        type=int,
+        default=2880,
+        help="Samples to keep in memory for /history (default 2880).",
+    )
+    cp.add_argument(
+        "--min-interval",
+        type=float,
+        default=10,
+        help="Seconds between polls while power flows are changing (default 10).",
+    )
+    cp.add_argument(
+        "--max-interval",
+        type=float,
+        default=120,
+        help="Seconds between polls while they are steady, or after an error (default 120).",
+    )
+    cp.add_argument(
+        "--threshold",
+        type=float,
+        default=50,
+        help="Watts of change in battery or grid power between polls that counts as changing (default 50).",
+    )
+    cp.set_defaults(func=run_daemon)
+
     cp = subp.add_parser(
         "get-daily-power-histogram",
         help="Get a daily power histogram from the staticsByDay endpoint.",
     )
+    cp.add_argument("date", type=parse_date, help="Date, in the format 2024-02-25.")
+    cp.set_defaults(func=get_daily_power_histogram)
+
+    cp = subp.add_parser(
+        "fetch-range",
+        help="Fetch daily power histograms for every day from START to END inclusive, into OUTPUT/<year>/<date>.json, skipping days already fetched.",
+    )
+    cp.add_argument("start", type=parse_date, help="First date, like 2024-02-25.")
+    cp.add_argument("end", type=parse_date, help="Last date, like 2024-02-25.")
+    cp.add_argument("--output", "-o", default="output", help="Default 'output'.")
     cp.add_argument(
-        "date",
-        type=lambda s: datetime.datetime.strptime(s, "%Y-%m-%d").date(),
-        help="Date, in the format 2024-02-25.",
+        "--jobs",
+        "-j",
+        type=int,
+        default=4,
+        help="Requests in flight at once (default 4).",
     )
-    cp.set_defaults(func=get_daily_power_histogram)
+    cp.add_argument(
+        "--rate",
+        type=float,
+        default=DEFAULT_RATE,
+        help="Requests per second to average at most (default %(default)g, so a year's days take about 75s).  The rate is halved each time the API answers 429 Too Many Requests, and regained gradually.",
+    )
+    cp.add_argument(
+        "--burst",
+        type=int,
+        default=4,
+        help="Requests which may be made at once before --rate applies (default 4).",
+    )
+    cp.set_defaults(func=fetch_range)
+
+    cp = subp.add_parser(
+        "ingest",
+        help="Add daily power histograms (JSON files, or directories of them, as written by fetch-range) to the archive, skipping days it already has from identical files and replacing those whose file has changed.",
+    )
+    cp.add_argument("paths", nargs="*", default=["output"], help="Default 'output'.")
+    cp.add_argument("--db", default=archive.DEFAULT_DB, help="Archive file.")
+    cp.set_defaults(func=ingest)
+
+    cp = subp.add_parser(
+        "query",
+        help="Print the archived 5-minute samples (or with --days, daily totals) from START to END inclusive.",
+    )
+    cp.add_argument("start", type=parse_date, help="First date, like 2024-02-25.")
+    cp.add_argument("end", type=parse_date, help="Last date, like 2024-02-25.")
+    cp.add_argument("--days", action="store_true", help="Print daily totals.")
+    cp.add_argument("--db", default=archive.DEFAULT_DB, help="Archive file.")
+    cp.set_defaults(func=query)
+
+    cp = subp.add_parser(
+        "analyze",
+        help="Summarise archived days from START to END inclusive: energy totals, self-consumption, battery cycles, import/export by hour of day and peak usage.  With --format csv, just the hourly table.",
+    )
+    cp.add_argument("start", type=parse_date, help="First date, like 2024-02-25.")
+    cp.add_argument("end", type=parse_date, help="Last date, like 2024-02-25.")
+    cp.add_argument("--db", default=archive.DEFAULT_DB, help="Archive file.")
+    cp.set_defaults(func=analyze)
 
     cp = subp.add_parser(
         "format-daily-power-histogram",
-        help="Take a JSON-format output file from `get-daily-power-histogram` and turn it into another format",
+        help="Take a JSON-format output file from `get-daily-power-histogram` and turn it into another format.  With --output-dir or --concat, convert many at once, across processes: each into --format in --output-dir, and/or all into one CSV sorted by date and time.",
+    )
+    cp.add_argument(
+        "paths",
+        nargs="+",
+        metavar="file",
+        help="A JSON file ('-' for stdin); or with --output-dir or --concat, JSON files, directories of them, or globs, named like 2024-02-25.json.",
+    )
+    cp.add_argument(
+        "--output-dir", "-o", help="Write each file's conversion here, by date."
+    )
+    cp.add_argument(
+        "--concat",
+        metavar="FILE",
+        help="Write every file's rows, with a Date column, to this CSV file ('-' for stdout).",
+    )
+    cp.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=os.cpu_count(),
+        help="Processes to use (default one per CPU).",
     )
-    cp.add_argument("file", type=argparse.FileType("r"))
     cp.set_defaults(func=format_daily_power_histogram)
 
     opts = ap.parse_args()
+    if (
+        opts.func == format_daily_power_histogram
+        and len(opts.paths) > 1
+        and not (opts.output_dir or opts.concat)
+    ):
+        ap.error(
+            "format-daily-power-histogram needs --output-dir or --concat for more than one file"
+        )
     opts.func(opts)
@@ -0,0 +1,95 @@
+"""
+Aggregates over many days of archived power histograms, computed with
+NumPy on a (days, 288) grid of 5-minute slots.
+"""
+
+import numpy as np
+
+import archive
+
+SLOTS = 288
+HOURS_PER_SLOT = 5 / 60
+
+
+def load(db, serial, start, end):
+    """
+    Return the archived dates from `start` to `end`, and a dict of
+    (days, SLOTS) arrays for each of archive.SAMPLE_FIELDS' columns, NaN
+    where there was no sample.
+    """
+    rows = archive.series(db, serial, start, end)
+    dates = [r[0] for r in rows]
+    grid = {c: np.full((len(rows), SLOTS), np.nan) for _, c in archive.SAMPLE_FIELDS}
+    for day, (_, minutes, *columns) in enumerate(rows):
+        slots = np.frombuffer(minutes, dtype=np.uint16) // 5
+        for (_, c), values in zip(archive.SAMPLE_FIELDS, columns):
+            grid[c][day, slots] = np.frombuffer(values, dtype=np.float64)
+    return dates, grid
+
+
+def _ratio(a, b):
+    return float(a / b) if b else None
+
+
+def analyze(dates, grid):
+    """
+    Summarise `grid` (from `load`), returning a dict of:
+
+    - totals in kWh of solar, export, import and usage
+    - self-consumption (the share of solar used on site) and
+      self-sufficiency (the share of usage not imported)
+    - equivalent full battery cycles (state-of-charge travelled / 200%)
+    - average kWh per day imported, exported, generated and used in
+      each hour of the day
+    - percentiles of each day's peak usage in kW, and how many days'
+      peaks fell in each hour of the day
+    """
+    kwh = {
+        c: grid[c] * HOURS_PER_SLOT
+        for c in ("ppv", "feed_in", "grid_charge", "home_power")
+    }
+    solar, export, imports, usage = (
+        float(np.nansum(kwh[c]))
+        for c in ("ppv", "feed_in", "grid_charge", "home_power")
+    )
+
+    soc = grid["cbat"].ravel()
+    soc = soc[~np.isnan(soc)]
+    cycles = float(np.abs(np.diff(soc)).sum() / 200)
+
+    def by_hour(c):
+        hourly = kwh[c].reshape(len(dates), 24, SLOTS // 24)
+        return np.nansum(hourly, axis=(0, 2)) / max(len(dates), 1)
+
+    home = grid["home_power"]
+    has_usage = ~np.all(np.isnan(home), axis=1)
+    peaks = np.nanmax(home[has_usage], axis=1)
+    peak_hours = np.nanargmax(home[has_usage], axis=1) // (SLOTS // 24)
+    q = [50, 90, 99, 100]
+
+    return dict(
+        first=dates[0] if dates else None,
+        last=dates[-1] if dates else None,
+        days=len(dates),
+        solar_kwh=solar,
+        export_kwh=export,
+        import_kwh=imports,
+        usage_kwh=usage,
+        self_consumption=_ratio(solar - export, solar),
+        self_sufficiency=_ratio(usage - imports, usage),
+        battery_cycles=cycles,
+        hourly=dict(
+            hour=list(range(24)),
+            import_kwh=by_hour("grid_charge").tolist(),
+            export_kwh=by_hour("feed_in").tolist(),
+            solar_kwh=by_hour("ppv").tolist(),
+            usage_kwh=by_hour("home_power").tolist(),
+            peak_usage_days=np.bincount(peak_hours, minlength=24).tolist(),
+        ),
+        peak_usage_kw=dict(
+            zip(
+                ["p50", "p90", "p99", "max"],
+                np.percentile(peaks, q).tolist() if len(peaks) else [None] * len(q),
+            )
+        ),
+    )
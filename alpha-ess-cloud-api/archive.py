@@ -0,0 +1,169 @@
+"""
+A SQLite archive of daily power histograms (the staticsByDay payloads),
+keyed by system serial number and date, for queries over long ranges
+without re-reading every day's JSON.
+
+Each day is one row: its totals, and its 5-minute series stored
+column-wise as packed arrays (minutes past midnight, and one float64
+array per series, NaN where the API gave null).  So a query costs one
+row per day rather than 288, and the series can be loaded straight into
+NumPy with `np.frombuffer`.  Arrays are in native byte order.
+
+Each row also has the SHA-256 of the file it came from, so a day
+fetched again with different contents replaces it.
+"""
+
+import array
+import hashlib
+import json
+import os
+import sqlite3
+
+DEFAULT_DB = "alphaess.sqlite"
+
+# payload key -> column, for the daily totals and the 5-minute series
+DAY_FIELDS = [
+    ("maxPpv", "max_ppv"),
+    ("maxFeedIn", "max_feed_in"),
+    ("maxGridCharge", "max_grid_charge"),
+    ("maxUsePower", "max_use_power"),
+    ("epvtoday", "epv"),
+    ("efeedIn", "efeed_in"),
+    ("einput", "einput"),
+    ("eload", "eload"),
+]
+SAMPLE_FIELDS = [
+    ("cbat", "cbat"),
+    ("ppv", "ppv"),
+    ("feedIn", "feed_in"),
+    ("gridCharge", "grid_charge"),
+    ("homePower", "home_power"),
+]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS days (
+    serial TEXT NOT NULL,
+    date TEXT NOT NULL,
+    {", ".join(c + " REAL" for _, c in DAY_FIELDS)},
+    minutes BLOB NOT NULL,
+    {", ".join(c + " BLOB NOT NULL" for _, c in SAMPLE_FIELDS)},
+    sha256 TEXT,
+    PRIMARY KEY (serial, date)
+);
+"""
+
+
+def connect(path=DEFAULT_DB):
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    columns = [row[1] for row in db.execute("PRAGMA table_info(days)")]
+    if "sha256" not in columns:
+        # archived before digests were kept; those days are replaced
+        # on their next ingest
+        db.execute("ALTER TABLE days ADD COLUMN sha256 TEXT")
+    return db
+
+
+def have_days(db, serial):
+    """
+    A dict of the dates (as "YYYY-MM-DD") already archived for `serial`
+    to the SHA-256 of the file each came from (None if not known).
+    """
+    return dict(db.execute("SELECT date, sha256 FROM days WHERE serial = ?", (serial,)))
+
+
+def time_minutes(time):
+    """
+    Minutes past midnight of a sample's `time`, given as "HH:MM" or
+    "YYYY-MM-DD HH:MM:SS".
+    """
+    hours, minutes = time.split()[-1].split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def _floats(values):
+    return array.array(
+        "d", (float("nan") if v is None else v for v in values)
+    ).tobytes()
+
+
+def add_day(db, serial, date, js, sha256=None):
+    """
+    Add (or replace) one day's payload `js` for `date` ("YYYY-MM-DD"),
+    from a file with digest `sha256`.
+    """
+    data = js["data"]
+    minutes = array.array("H", map(time_minutes, data["time"])).tobytes()
+    columns = ["serial", "date", *(c for _, c in DAY_FIELDS), "minutes"]
+    columns += [c for _, c in SAMPLE_FIELDS] + ["sha256"]
+    db.execute(
+        f"INSERT OR REPLACE INTO days ({', '.join(columns)})"
+        f" VALUES ({', '.join('?' * len(columns))})",
+        [serial, date]
+        + [data.get(k) for k, _ in DAY_FIELDS]
+        + [minutes]
+        + [_floats(data[k]) for k, _ in SAMPLE_FIELDS]
+        + [sha256],
+    )
+
+
+def ingest(db, serial, files):
+    """
+    Add each of `files` (named like YYYY-MM-DD.json, as fetch-range
+    writes them) whose date isn't archived already, or was archived
+    from a file with different contents (such as a day refetched once
+    it was complete).  Returns the dates added and those replaced.
+    """
+    have = have_days(db, serial)
+    added = []
+    replaced = []
+    with db:
+        for fn in files:
+            date = os.path.splitext(os.path.basename(fn))[0]
+            with open(fn, "rb") as f:
+                body = f.read()
+            sha256 = hashlib.sha256(body).hexdigest()
+            if have.get(date, False) == sha256:
+                continue
+            js = json.loads(body)
+            if not js.get("data"):
+                continue
+            add_day(db, serial, date, js, sha256)
+            (replaced if date in have else added).append(date)
+            have[date] = sha256
+    return added, replaced
+
+
+def days(db, serial, start, end):
+    """
+    The daily totals from `start` to `end` inclusive, as rows of date and
+    then DAY_FIELDS.
+    """
+    return db.execute(
+        f"SELECT date, {', '.join(c for _, c in DAY_FIELDS)} FROM days"
+        " WHERE serial = ? AND date BETWEEN ? AND ? ORDER BY date",
+        (serial, str(start), str(end)),
+    ).fetchall()
+
+
+def series(db, serial, start, end):
+    """
+    The 5-minute series from `start` to `end` inclusive, as rows of
+    date, then the packed minutes and SAMPLE_FIELDS arrays.
+    """
+    return db.execute(
+        f"SELECT date, minutes, {', '.join(c for _, c in SAMPLE_FIELDS)} FROM days"
+        " WHERE serial = ? AND date BETWEEN ? AND ? ORDER BY date",
+        (serial, str(start), str(end)),
+    ).fetchall()
+
+
+def samples(db, serial, start, end):
+    """
+    Yield the 5-minute samples from `start` to `end` inclusive, as rows
+    of "YYYY-MM-DD HH:MM" and then SAMPLE_FIELDS.
+    """
+    for date, minutes, *columns in series(db, serial, start, end):
+        columns = [array.array("d", c) for c in columns]
+        for m, *values in zip(array.array("H", minutes), *columns):
+            yield (f"{date} {m // 60:02d}:{m % 60:02d}", *values)
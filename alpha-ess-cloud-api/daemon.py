@@ -0,0 +1,128 @@
+"""
+Polls the latest instantaneous power data on an asyncio loop, keeping
+recent samples in a ring buffer and an append-only log, and serves them
+over HTTP on localhost so that consumers needn't each hit the cloud API.
+
+The polling interval adapts: it drops to the minimum whenever battery
+or grid power moves by more than a threshold between samples, and
+doubles (up to the maximum) while they are steady.
+
+Endpoints, all JSON:
+
+    /latest     the most recent sample
+    /history    every sample in the ring buffer, oldest first
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import json
+import os
+import sys
+import time
+
+FIELDS = ("ppv", "pbat", "pload", "pgrid", "soc")
+
+
+class Poller:
+    def __init__(self, fetch, log, size, min_interval, max_interval, threshold):
+        self.fetch = fetch
+        self.log = log
+        self.samples = collections.deque(maxlen=size)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.threshold = threshold
+        self.interval = min_interval
+        # `fetch` blocks; one thread keeps its connection alive
+        self.executor = concurrent.futures.ThreadPoolExecutor(1)
+
+    def load(self):
+        """
+        Fill the ring buffer from the end of the log.
+        """
+        if os.path.exists(self.log):
+            with open(self.log) as f:
+                tail = collections.deque(f, maxlen=self.samples.maxlen)
+            self.samples.extend(json.loads(line) for line in tail if line.strip())
+
+    def record(self, data):
+        sample = dict(time=round(time.time(), 3), **{k: data[k] for k in FIELDS})
+        previous = self.samples[-1] if self.samples else None
+        self.samples.append(sample)
+        with open(self.log, "a") as f:
+            f.write(json.dumps(sample) + "\n")
+
+        if (
+            previous is not None
+            and max(abs(sample[k] - previous[k]) for k in ("pbat", "pgrid"))
+            >= self.threshold
+        ):
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * 2)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                data = await loop.run_in_executor(self.executor, self.fetch)
+                self.record(data)
+            except Exception as e:
+                print("poll failed:", e, file=sys.stderr, flush=True)
+                self.interval = self.max_interval
+            await asyncio.sleep(self.interval)
+
+
+async def _handle(poller, reader, writer):
+    try:
+        request = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        path = request.split()[1].decode() if len(request.split()) > 1 else ""
+
+        if path == "/latest" and poller.samples:
+            status, body = "200 OK", poller.samples[-1]
+        elif path == "/history":
+            status, body = "200 OK", list(poller.samples)
+        else:
+            status, body = "404 Not Found", dict(error="no such thing")
+
+        body = json.dumps(body).encode()
+        writer.write(
+            (
+                f"HTTP/1.0 {status}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n"
+            ).encode()
+            + body
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def _main(poller, host, port):
+    server = await asyncio.start_server(lambda r, w: _handle(poller, r, w), host, port)
+    async with server:
+        await asyncio.gather(server.serve_forever(), poller.run())
+
+
+def run(fetch, opts):
+    """
+    Poll `fetch` (which returns a getLastPowerData `data` dict) forever,
+    as configured by `opts` from the `daemon` subcommand.
+    """
+    poller = Poller(
+        fetch,
+        opts.log,
+        opts.size,
+        opts.min_interval,
+        opts.max_interval,
+        opts.threshold,
+    )
+    poller.load()
+    print(f"Serving on http://{opts.host}:{opts.port}/latest", flush=True)
+    try:
+        asyncio.run(_main(poller, opts.host, opts.port))
+    except KeyboardInterrupt:
+        pass
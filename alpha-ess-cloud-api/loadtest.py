@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Drives the alphaess.py client hard against a stand-in API (see
+mockserver.py), to tune its connection handling, concurrency and
+retries offline.  Reports calls/sec and latency percentiles, and, when
+it runs the stand-in itself, how many requests and connections that
+took.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import datetime
+import sys
+import threading
+import time
+import types
+import urllib.error
+
+import mockserver
+
+try:
+    import config
+except ImportError:
+    # the stand-in doesn't check credentials, so none are needed
+    sys.modules["config"] = types.SimpleNamespace(serial="AL0", auth_jwt="")
+
+import alphaess
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+def main(opts):
+    server = None
+    if opts.url:
+        alphaess.BASE_URL = opts.url
+    else:
+        server = mockserver.make_server("127.0.0.1", 0, opts)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]
+        alphaess.BASE_URL = f"http://{host}:{port}{mockserver.PREFIX}"
+
+    if opts.endpoint == "days":
+        call = lambda i: alphaess.fetch_daily_power_histogram(
+            opts.start + datetime.timedelta(days=i)
+        )
+    else:
+        call = lambda i: alphaess.fetch_last_power()
+    if opts.retry:
+        bucket = alphaess.TokenBucket(opts.rate, opts.burst)
+        plain = call
+        call = lambda i: alphaess.with_retries(
+            lambda: plain(i), bucket, opts.retries, opts.backoff
+        )
+
+    def timed(i):
+        t = time.perf_counter()
+        try:
+            call(i)
+            outcome = "ok"
+        except urllib.error.HTTPError as e:
+            outcome = f"HTTP {e.code}"
+        except Exception as e:
+            outcome = type(e).__name__
+        return time.perf_counter() - t, outcome
+
+    print(
+        f"{opts.requests} {opts.endpoint} calls, {opts.jobs} at a time,",
+        "against",
+        alphaess.BASE_URL,
+        file=sys.stderr,
+        flush=True,
+    )
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(opts.jobs) as pool:
+        results = list(pool.map(timed, range(opts.requests)))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(t * 1000 for t, _ in results)
+    outcomes = collections.Counter(outcome for _, outcome in results)
+    print(f"calls:       {len(results)} in {wall:.3f}s, {len(results) / wall:.1f}/s")
+    for outcome, n in sorted(outcomes.items()):
+        print(f"  {outcome + ':':10s} {n}")
+    print(
+        "latency ms: ",
+        " ".join(f"p{q}={percentile(latencies, q):.1f}" for q in (50, 90, 99)),
+        f"max={latencies[-1]:.1f}",
+    )
+    if server:
+        stats = server.stats
+        print(f"requests:    {sum(v for k, v in stats.items() if k != 'connections')}")
+        for status in sorted(k for k in stats if k != "connections"):
+            print(f"  {str(status) + ':':10s} {stats[status]}")
+        print(f"connections: {stats['connections']}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(
+        description="Load-test the alphaess.py client against a stand-in API, by default one run here with the options below."
+    )
+    ap.add_argument(
+        "--url",
+        help="Instead of running a stand-in, use the API at URL (e.g. http://127.0.0.1:8087/api/base/ for mockserver.py).",
+    )
+    ap.add_argument(
+        "--endpoint",
+        choices=["days", "last-power"],
+        default="days",
+        help="Call fetch_daily_power_histogram, for successive days, or fetch_last_power.",
+    )
+    ap.add_argument(
+        "--start",
+        type=alphaess.parse_date,
+        default=datetime.date(2023, 1, 1),
+        help="The first day fetched by --endpoint days.",
+    )
+    ap.add_argument(
+        "--requests",
+        "-n",
+        type=int,
+        default=1000,
+        help="The number of calls to make.",
+    )
+    ap.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=4,
+        help="The number of calls to make at once, each thread with its own connection.",
+    )
+    ap.add_argument(
+        "--retry",
+        action="store_true",
+        help="Make the calls through alphaess.with_retries, as fetch-range does, with the options below.",
+    )
+    ap.add_argument(
+        "--rate",
+        type=float,
+        default=1000.0,
+        help="With --retry, the average number of requests per second allowed.",
+    )
+    ap.add_argument(
+        "--burst",
+        type=int,
+        default=100,
+        help="With --retry, the number of requests allowed at once after a lull.",
+    )
+    ap.add_argument(
+        "--retries",
+        type=int,
+        default=6,
+        help="With --retry, the number of times to retry a call.",
+    )
+    ap.add_argument(
+        "--backoff",
+        type=float,
+        default=0.1,
+        help="With --retry, the initial backoff in seconds, doubled with each retry.",
+    )
+    mockserver.add_arguments(ap)
+    main(ap.parse_args())
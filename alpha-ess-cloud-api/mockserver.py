@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+A local stand-in for the parts of the AlphaESS cloud API that
+alphaess.py uses, for testing and load-testing the client without
+being rate-limited by (or hammering) the real thing.
+
+It serves `power/staticsByDay` and `energyStorage/getLastPowerData`
+under /api/base/, from recorded responses where it has them (the
+output directory of fetch-range, and the log of the `daemon`
+subcommand) and otherwise synthetic ones, made deterministically from
+the date.  Each response can be delayed, and can fail with a 500 or be
+throttled with a 429 and Retry-After at given rates.
+
+Point alphaess.py at it by setting `base_url` in config.py (see
+config.py.in), or use loadtest.py, which runs one itself.
+"""
+
+import argparse
+import collections
+import datetime
+import gzip
+import http.server
+import json
+import math
+import os
+import random
+import threading
+import time
+import urllib.parse
+
+PREFIX = "/api/base/"
+TIMES = ["%02d:%02d" % (m // 60, m % 60) for m in range(0, 1440, 5)]
+
+
+def synthetic_day(date):
+    """
+    A staticsByDay payload for `date` ("YYYY-MM-DD"): a solar curve
+    scaled by the season and some noise, with usage, export, import and
+    battery charge to match.  For today, only the slots so far.
+    """
+    rng = random.Random(date)
+    d = datetime.date.fromisoformat(date)
+    season = 0.6 + 0.4 * math.cos((d.timetuple().tm_yday - 172) / 365 * 2 * math.pi)
+    peak = rng.uniform(2, 5) * season
+
+    cbat, ppv, feed_in, grid_charge, home = [], [], [], [], []
+    soc = rng.uniform(10, 60)
+    for i, _ in enumerate(TIMES):
+        sun = max(0.0, math.sin((i - 72) / 144 * math.pi))
+        p = round(peak * sun * rng.uniform(0.7, 1.0), 3)
+        h = round(rng.uniform(0.2, 0.6) + (rng.random() < 0.05) * rng.uniform(1, 3), 3)
+        soc = min(100.0, max(10.0, soc + (p - h) * 2))
+        cbat.append(round(soc, 1))
+        ppv.append(p)
+        feed_in.append(round(max(0.0, p - h) * (soc >= 100), 3))
+        grid_charge.append(round(max(0.0, h - p) * (soc <= 10), 3))
+        home.append(h)
+
+    if d == datetime.date.today():
+        now = datetime.datetime.now()
+        n = (now.hour * 60 + now.minute) // 5 + 1
+        cbat, ppv, feed_in, grid_charge, home = (
+            s[:n] for s in (cbat, ppv, feed_in, grid_charge, home)
+        )
+
+    def kwh(series):
+        return round(sum(series) / 12, 1)
+
+    return dict(
+        time=TIMES[: len(ppv)],
+        cbat=cbat,
+        ppv=ppv,
+        feedIn=feed_in,
+        gridCharge=grid_charge,
+        homePower=home,
+        maxPpv=max(ppv),
+        maxFeedIn=max(feed_in),
+        maxGridCharge=max(grid_charge),
+        maxUsePower=max(home),
+        epvtoday=kwh(ppv),
+        efeedIn=kwh(feed_in),
+        einput=kwh(grid_charge),
+        eload=kwh(home),
+    )
+
+
+def synthetic_last_power(now):
+    """
+    A getLastPowerData payload for the time `now`, in seconds since the
+    epoch.
+    """
+    rng = random.Random(int(now))
+    t = time.localtime(now)
+    sun = max(0.0, math.sin((t.tm_hour * 60 + t.tm_min - 360) / 720 * math.pi))
+    ppv = round(4000 * sun * rng.uniform(0.7, 1.0))
+    pload = round(rng.uniform(200, 600))
+    pbat = round((ppv - pload) * rng.uniform(0.5, 1.0))
+    return dict(
+        ppv=ppv,
+        pbat=pbat,
+        pload=pload,
+        pgrid=pload - ppv + pbat,
+        soc=round(rng.uniform(10, 100), 1),
+    )
+
+
+class Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        retry_after=1,
+        replay=None,
+        replay_last_power=None,
+    ):
+        super().__init__(address, Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.replay = replay
+        self.last_power = []
+        if replay_last_power:
+            with open(replay_last_power) as f:
+                self.last_power = [json.loads(line) for line in f if line.strip()]
+        # responses by status, and "connections"
+        self.stats = collections.Counter()
+        self.lock = threading.Lock()
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def statics_by_day(self, date):
+        if self.replay:
+            fn = os.path.join(self.replay, date[:4], date + ".json")
+            if os.path.exists(fn):
+                with open(fn) as f:
+                    return json.load(f)
+        return dict(code=200, msg="Success", data=synthetic_day(date))
+
+    def last_power_data(self):
+        if self.last_power:
+            # replay the log round and round, a sample a second
+            sample = self.last_power[int(time.time()) % len(self.last_power)]
+            data = {k: v for k, v in sample.items() if k != "time"}
+        else:
+            data = synthetic_last_power(time.time())
+        return dict(code=200, msg="Success", data=data)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # the headers and body go in separate writes; don't hold the body
+    # back waiting for an ACK
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.count("connections")
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        delay = server.latency + random.uniform(-server.jitter, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        endpoint = url.path[len(PREFIX) :] if url.path.startswith(PREFIX) else None
+        headers = {}
+
+        roll = random.random()
+        if roll < server.throttle_rate:
+            status, body = 429, dict(code=429, msg="Too Many Requests")
+            headers["Retry-After"] = str(server.retry_after)
+        elif roll < server.throttle_rate + server.error_rate:
+            status, body = 500, dict(code=500, msg="Internal Server Error")
+        elif endpoint == "power/staticsByDay" and "date" in query:
+            status, body = 200, server.statics_by_day(query["date"])
+        elif endpoint == "energyStorage/getLastPowerData":
+            status, body = 200, server.last_power_data()
+        else:
+            status, body = 404, dict(code=404, msg="Not Found")
+
+        body = json.dumps(body).encode()
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+        server.count(status)
+
+
+def add_arguments(ap):
+    ap.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Delay each response by this many seconds.",
+    )
+    ap.add_argument(
+        "--jitter",
+        type=float,
+        default=0.0,
+        help="Vary the delay of each response by up to this many seconds either way.",
+    )
+    ap.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fail this fraction of requests with a 500.",
+    )
+    ap.add_argument(
+        "--throttle-rate",
+        type=float,
+        default=0.0,
+        help="Throttle this fraction of requests with a 429.",
+    )
+    ap.add_argument(
+        "--retry-after",
+        type=int,
+        default=1,
+        help="The Retry-After, in seconds, of a 429.",
+    )
+    ap.add_argument(
+        "--replay",
+        metavar="DIR",
+        help="Serve the daily power histograms fetched into DIR (laid out as by fetch-range), where there is one for the date asked.",
+    )
+    ap.add_argument(
+        "--replay-last-power",
+        metavar="LOG",
+        help="Serve the latest power data from the samples in LOG (as written by the daemon subcommand).",
+    )
+
+
+def make_server(host, port, opts):
+    """
+    A Server listening on `host` and `port` (0 to pick one), configured
+    from `opts` as given by `add_arguments`.
+    """
+    return Server(
+        (host, port),
+        latency=opts.latency,
+        jitter=opts.jitter,
+        error_rate=opts.error_rate,
+        throttle_rate=opts.throttle_rate,
+        retry_after=opts.retry_after,
+        replay=opts.replay,
+        replay_last_power=opts.replay_last_power,
+    )
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(
+        description="Serve a stand-in for the AlphaESS cloud API, for testing."
+    )
+    ap.add_argument("--host", default="127.0.0.1", help="The address to listen on.")
+    ap.add_argument("--port", type=int, default=8087, help="The port to listen on.")
+    add_arguments(ap)
+    opts = ap.parse_args()
+
+    server = make_server(opts.host, opts.port, opts)
+    host, port = server.server_address[:2]
+    print(f"Serving on http://{host}:{port}{PREFIX}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,182 @@
+"""
+Measures how fast the scripts in this directory process a tree of
+inputs made by synth.py.
+
+Each case is run as a subprocess in that tree, with any caches of its
+inputs removed first, and reports wall/CPU time, peak RSS and input
+lines per second.  Cases which draw figures also report the time spent
+drawing them (their "draw" phase, see profiling.py), apart from reading
+their inputs.  Results are written as JSON lines.
+"""
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import profiling
+import synth
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+RUSTLS = synth.RUSTLS_FILES[0]
+TAGS = [
+    "handshakes",
+    "?",
+    "?",
+    "TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384",
+    "server",
+    "server-auth",
+    "tickets",
+]
+LATENCY = [
+    os.path.join(impl, "latency-%s-server.tsv" % kind)
+    for impl in synth.LATENCY_IMPLS
+    for kind in synth.LATENCY_KINDS
+]
+CRITERION = [
+    os.path.join(arch, "clienthello", bench, "new", "sample.json")
+    for arch in ("amd64", "arm64")
+    for bench in synth.CRITERION_BENCHES
+]
+
+# name, command line, inputs, whether to keep caches from earlier cases
+CASES = [
+    ("slice-scan", ["slice.py", "--no-cache", RUSTLS, *TAGS], [RUSTLS], False),
+    ("slice", ["slice.py", RUSTLS, *TAGS], [RUSTLS], False),
+    ("slice-warm", ["slice.py", RUSTLS, *TAGS], [RUSTLS], True),
+    (
+        "table",
+        ["table.py", RUSTLS, "tickets=" + " ".join(TAGS)],
+        [RUSTLS],
+        False,
+    ),
+    ("extract", ["extract.py", "extract", "result.txt"], ["result.txt"], False),
+    ("extract-osl", ["extract-osl.py", "openssl.txt"], ["openssl.txt"], False),
+    (
+        "thread-graphs",
+        ["thread-graphs.py", "--force"],
+        list(synth.RUSTLS_FILES + synth.OPENSSL_FILES),
+        False,
+    ),
+    ("latency-histogram", ["latency-histogram.py", "--force"], LATENCY, False),
+    ("pq-violins", ["pq-violins.py"], CRITERION, False),
+]
+
+# Cases whose draw phase is timed, with --profile-json.  Not the others,
+# as counting lines for the profile slows their parsing a little.
+DRAWS = {"thread-graphs", "latency-histogram", "pq-violins"}
+
+
+def count_lines(fn):
+    if fn.endswith(".json"):
+        with open(fn) as f:
+            return len(json.load(f)["iters"])
+    with open(fn, "rb") as f:
+        return sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+
+
+def clear_caches(fn):
+    for cache in glob.glob(glob.escape(fn) + ".*"):
+        if cache.endswith((".slice", ".npy")):
+            os.unlink(cache)
+
+
+def run(name, argv, inputs, keep, where):
+    if not keep:
+        for fn in inputs:
+            clear_caches(os.path.join(where, fn))
+    lines = sum(count_lines(os.path.join(where, fn)) for fn in inputs)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        phases_file = os.path.join(tmp, "phases.json")
+        if name in DRAWS:
+            argv = argv + ["--profile-json", phases_file]
+
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(HERE, argv[0]), *argv[1:]],
+            cwd=where,
+            stdout=subprocess.DEVNULL,
+        )
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+
+        phases = {}
+        if os.path.exists(phases_file):
+            with open(phases_file) as f:
+                phases = json.load(f)
+
+    draw = phases.get("draw")
+    return dict(
+        case=name,
+        status=proc.returncode,
+        lines=lines,
+        wall_s=round(wall, 4),
+        user_s=round(usage.ru_utime, 4),
+        sys_s=round(usage.ru_stime, 4),
+        max_rss_kb=profiling.max_rss_kb(usage),
+        lines_per_s=round(lines / wall),
+        render_s=round(draw["wall_s"], 4) if draw else None,
+        phases={k: round(v["wall_s"], 4) for k, v in phases.items()},
+    )
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument(
+        "--generate",
+        type=int,
+        metavar="SCALE",
+        help="First (re)generate the inputs with synth.py at this scale.",
+    )
+    ap.add_argument(
+        "--case",
+        action="append",
+        choices=[c[0] for c in CASES],
+        help="Only run these cases (default all).",
+    )
+    ap.add_argument(
+        "--output",
+        "-o",
+        type=argparse.FileType("a"),
+        default=sys.stdout,
+        help="Append JSON lines results here (default stdout).",
+    )
+    ap.add_argument("where", help="Directory of synth.py inputs.")
+    opts = ap.parse_args()
+
+    if opts.generate:
+        synth.generate(opts.where, opts.generate, opts.generate, opts.generate)
+
+    rev = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"],
+        cwd=HERE,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+    for name, argv, inputs, keep in CASES:
+        if opts.case and name not in opts.case:
+            continue
+        result = run(name, argv, inputs, keep, opts.where)
+        result.update(rev=rev, time=int(time.time()))
+        print(json.dumps(result), file=opts.output, flush=True)
+        render = result["render_s"]
+        print(
+            "%-18s %8.2fs %8d KiB %12d lines/s %15s%s"
+            % (
+                name,
+                result["wall_s"],
+                result["max_rss_kb"],
+                result["lines_per_s"],
+                "" if render is None else "%.2fs drawing" % render,
+                "" if result["status"] == 0 else "  (exit %d)" % result["status"],
+            ),
+            file=sys.stderr,
+        )
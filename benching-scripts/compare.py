@@ -0,0 +1,202 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+import slice
+import table
+
+
+def samples(rows):
+    """
+    Return `rows` as a dict of thread count -> array of measurements.
+    """
+    return {
+        int(threads): np.array(measures, dtype=np.float64)
+        for threads, measures in table.by_threads(rows).items()
+    }
+
+
+def bootstrap_means(rng, values, resamples):
+    """
+    Means of `resamples` bootstrap resamples of `values`, as one array.
+    """
+    picks = rng.integers(0, len(values), size=(resamples, len(values)))
+    return values[picks].mean(axis=1)
+
+
+def compare(rng, base, cand, confidence, resamples):
+    """
+    Compare two series from `samples`, returning a list of
+    `(threads, base mean, cand mean, delta, low, high)` for each thread
+    count they share, plus the same for the mean delta over all of them.
+
+    Deltas are relative (cand / base - 1), and `low`/`high` bound the
+    `confidence` bootstrap interval.  Thread counts with only one
+    measurement on either side have no interval (NaN).  The overall
+    interval is bootstrapped over the per-thread-count deltas, so needs
+    at least two thread counts but not their intervals: a sweep with one
+    measurement per thread count still gets one.
+    """
+    tails = [(1 - confidence) / 2 * 100, (1 + confidence) / 2 * 100]
+
+    rows = []
+    deltas = []
+    for threads in sorted(set(base) & set(cand)):
+        a, b = base[threads], cand[threads]
+        delta = b.mean() / a.mean() - 1
+        low = high = np.nan
+        if len(a) > 1 and len(b) > 1:
+            boot = (
+                bootstrap_means(rng, b, resamples) / bootstrap_means(rng, a, resamples)
+                - 1
+            )
+            low, high = np.percentile(boot, tails)
+        rows.append((threads, a.mean(), b.mean(), delta, low, high))
+        deltas.append(delta)
+
+    if not deltas:
+        return rows, None
+
+    deltas = np.array(deltas)
+    low = high = np.nan
+    if len(deltas) > 1:
+        low, high = np.percentile(bootstrap_means(rng, deltas, resamples), tails)
+    overall = (
+        "all",
+        np.mean([r[1] for r in rows]),
+        np.mean([r[2] for r in rows]),
+        deltas.mean(),
+        low,
+        high,
+    )
+    return rows, overall
+
+
+def is_regression(row, threshold):
+    """
+    A regression is a delta whose whole interval is below -threshold.
+    Without an interval, nothing is a regression.
+    """
+    _, _, _, _, _, high = row
+    return not np.isnan(high) and high < -threshold
+
+
+def percent(v):
+    return "-" if np.isnan(v) else "%+.2f%%" % (v * 100)
+
+
+def format_row(row, threshold):
+    threads, a, b, delta, low, high = row
+    if np.isnan(high):
+        verdict = "\tno interval"
+    elif is_regression(row, threshold):
+        verdict = "\tREGRESSION"
+    else:
+        verdict = ""
+    return "%s\t%g\t%g\t%s\t%s\t%s%s" % (
+        threads,
+        a,
+        b,
+        percent(delta),
+        percent(low),
+        percent(high),
+        verdict,
+    )
+
+
+def self_check():
+    """
+    Run the comparison end to end on a sweep with one measurement per
+    thread count, returning True if a uniform 20% slowdown exits 1 and
+    no change exits 0.
+    """
+    tags = ["handshakes", "TLS13_AES_256_GCM_SHA384", "server", "tickets"]
+    with tempfile.TemporaryDirectory() as where:
+        files = {}
+        for factor in (1.0, 0.8, 1.0):
+            fn = os.path.join(where, "%d.txt" % len(files))
+            with open(fn, "w") as f:
+                for threads in range(1, 17):
+                    per_thread = 10000 / (1 + 0.02 * (threads - 1)) * factor
+                    f.write(
+                        "\t".join(
+                            tags
+                            + ["threads", str(threads), "per-thread"]
+                            + ["%.2f" % per_thread, "handshakes/s\n"]
+                        )
+                    )
+            files[fn] = factor
+        base, slower, same = files
+        argv = ["--pattern", " ".join(tags), base]
+        with contextlib.redirect_stdout(io.StringIO()):
+            return main(argv + [slower]) == 1 and main(argv + [same]) == 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(
+        description="Compare throughput series between a baseline result file and one or more candidates.",
+    )
+    ap.add_argument(
+        "--pattern",
+        "-p",
+        action="append",
+        help="Tags selecting a series, as for slice.py, eg. 'handshakes ? ? TLS13_AES_256_GCM_SHA384 server server-auth tickets'.  May be repeated.",
+    )
+    ap.add_argument(
+        "--threshold",
+        type=float,
+        default=0.02,
+        help="Smallest relative slowdown counted as a regression (default 0.02, ie. 2%%).",
+    )
+    ap.add_argument("--confidence", type=float, default=0.95)
+    ap.add_argument("--resamples", type=int, default=10000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument(
+        "--self-check",
+        action="store_true",
+        help="Instead, check that a uniform slowdown over a thread sweep is flagged as a regression.",
+    )
+    ap.add_argument("baseline", nargs="?")
+    ap.add_argument("candidates", nargs="*")
+    opts = ap.parse_args(argv)
+
+    if opts.self_check:
+        ok = self_check()
+        print("self-check", "passed" if ok else "FAILED")
+        return 0 if ok else 1
+    if not (opts.pattern and opts.baseline and opts.candidates):
+        ap.error("--pattern, a baseline and at least one candidate are needed")
+
+    rng = np.random.default_rng(opts.seed)
+    files = [opts.baseline] + opts.candidates
+    patterns = [p.split() for p in opts.pattern]
+    results = slice.select_many([(f, tags) for tags in patterns for f in files])
+
+    regressions = 0
+    for n, pattern in enumerate(opts.pattern):
+        base, *cands = [
+            samples(rows) for rows in results[n * len(files) : (n + 1) * len(files)]
+        ]
+        for cand_file, cand in zip(opts.candidates, cands):
+            print("%s vs %s: %s" % (cand_file, opts.baseline, pattern))
+            print("threads\tbaseline\tcandidate\tdelta\tlow\thigh")
+            rows, overall = compare(rng, base, cand, opts.confidence, opts.resamples)
+            if overall is None:
+                print("no thread counts in common")
+                print()
+                continue
+            for row in rows + [overall]:
+                print(format_row(row, opts.threshold))
+                regressions += is_regression(row, opts.threshold)
+            print()
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
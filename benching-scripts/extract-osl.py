@@ -1,43 +1,107 @@
-import sys
+import argparse
 
-lines = open(sys.argv[-1], "r").readlines()
+import inputs
+import profiling
 
 
-def out(line):
+def value(line):
     items = line.split()
     for i in items:
         if i[0].isdigit():
-            print(i)
+            return i
+
+
+class Section:
+    """
+    Collects the first `first` and `second` lines following a line
+    containing `introducer`.
+    """
+
+    def __init__(self, introducer, first, second):
+        self.introducer = introducer
+        self.wanted = [first, second]
+        self.inside = False
+        self.found = []
+
+    def feed(self, l):
+        if self.introducer in l:
+            self.inside = True
+            return
+        if not self.inside:
             return
+        for w in list(self.wanted):
+            if l.startswith(w):
+                self.wanted.remove(w)
+                self.found.append(value(l))
+
+    @property
+    def done(self):
+        return not self.wanted
 
 
-def extract(introducer, first, second):
-    inside = False
-    done_first = False
-    done_second = False
-    for l in lines:
-        if introducer in l:
-            inside = True
-            continue
-        if inside and not done_first and l.startswith(first):
-            out(l)
-            done_first = True
-        if inside and not done_second and l.startswith(second):
-            out(l)
-            done_second = True
-
-
-print("bulk column ----")
-extract("bulk ECDHE-RSA-AES128-GCM-SHA256", "send", "recv")
-extract("bulk TLS_AES_256_GCM_SHA384", "send", "recv")
-
-print("handshakes column ----")
 client, server = "handshakes\tclient", "handshakes\tserver"
-extract("handshake ECDHE-RSA-AES256-GCM-SHA384", client, server)
-extract("handshake ECDHE-ECDSA-AES256-GCM-SHA384", client, server)
-extract("handshake TLS_AES_256_GCM_SHA384", client, server)
-extract("--ecdsa handshake TLS_AES_256_GCM_SHA384", client, server)
-
-print("resumption column ----")
-extract("handshake-resume ECDHE-RSA-AES256-GCM-SHA384", client, server)
-extract("handshake-ticket TLS_AES_256_GCM_SHA384", client, server)
+
+COLUMNS = [
+    (
+        "bulk column ----",
+        [
+            ("bulk ECDHE-RSA-AES128-GCM-SHA256", "send", "recv"),
+            ("bulk TLS_AES_256_GCM_SHA384", "send", "recv"),
+        ],
+    ),
+    (
+        "handshakes column ----",
+        [
+            ("handshake ECDHE-RSA-AES256-GCM-SHA384", client, server),
+            ("handshake ECDHE-ECDSA-AES256-GCM-SHA384", client, server),
+            ("handshake TLS_AES_256_GCM_SHA384", client, server),
+            ("--ecdsa handshake TLS_AES_256_GCM_SHA384", client, server),
+        ],
+    ),
+    (
+        "resumption column ----",
+        [
+            ("handshake-resume ECDHE-RSA-AES256-GCM-SHA384", client, server),
+            ("handshake-ticket TLS_AES_256_GCM_SHA384", client, server),
+        ],
+    ),
+]
+
+
+def extract(lines, columns):
+    """
+    Run every section in `columns` over `lines` in a single pass, and
+    return the values found as a list of (header, [[values]...]).
+    """
+    sections = [[Section(*s) for s in specs] for _, specs in columns]
+    pending = [s for col in sections for s in col]
+
+    for l in lines:
+        for s in pending:
+            s.feed(l)
+        if any(s.done for s in pending):
+            pending = [s for s in pending if not s.done]
+            if not pending:
+                break
+
+    return [
+        (header, [s.found for s in col]) for (header, _), col in zip(columns, sections)
+    ]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("file", nargs="?", default="-", help="Log to read (default stdin).")
+    profiling.add_arguments(ap)
+    opts = ap.parse_args()
+    profiling.start(opts)
+
+    with profiling.phase("parse", opts.file) as p, inputs.open_text(opts.file) as f:
+        results = extract(p.count(f), COLUMNS)
+
+    for header, found in results:
+        print(header)
+        for values in found:
+            for v in values:
+                if v is not None:
+                    print(v)
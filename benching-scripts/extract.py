@@ -0,0 +1,181 @@
+import collections
+import sys
+
+import inputs
+
+# One output column: the `field`th (1-based, like `cut -f`) field of every
+# line that has all of `words` as fields, up to `limit` lines.
+Column = collections.namedtuple("Column", "words field limit", defaults=(None,))
+
+SPECS = {
+    "extract": [
+        "bulk ----",
+        "transfer, 1.2, aes-128-gcm",
+        Column(("bulk", "TLS_ECDHE_RSA_WITH_AES_128_GCM_SHA256"), 6),
+        "transfer, 1.3, aes-256-gcm",
+        Column(("bulk", "TLS13_AES_256_GCM_SHA384"), 6),
+        "transfer, 1.2, aes-128-gcm, unbuf",
+        Column(("bulk-unbuffered", "TLS_ECDHE_RSA_WITH_AES_128_GCM_SHA256"), 6),
+        "transfer, 1.3, aes-256-gcm, unbuf",
+        Column(("bulk-unbuffered", "TLS13_AES_256_GCM_SHA384"), 6),
+        "",
+        "handshakes ----",
+        "full handshakes, 1.2, rsa",
+        Column(("handshakes", "TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384", "no-resume"), 8),
+        "resumed handshakes, 1.2",
+        Column(("handshakes", "TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384", "sessionid"), 8),
+        "full handshakes, 1.3, rsa",
+        Column(("handshakes", "TLS13_AES_256_GCM_SHA384", "no-resume"), 8),
+        "full handshakes, 1.2, rsa, unbuf",
+        Column(
+            (
+                "handshakes-unbuffered",
+                "TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384",
+                "no-resume",
+            ),
+            8,
+        ),
+        "resumed handshakes, 1.2, unbuf",
+        Column(
+            (
+                "handshakes-unbuffered",
+                "TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384",
+                "sessionid",
+            ),
+            8,
+        ),
+        "full handshakes, 1.3, rsa, unbuf",
+        Column(("handshakes-unbuffered", "TLS13_AES_256_GCM_SHA384", "no-resume"), 8),
+    ],
+    "extract-3": [
+        "bulk column ----",
+        Column(("bulk", "TLS_ECDHE_RSA_WITH_AES_128_GCM_SHA256"), 6),
+        Column(("bulk", "TLS13_AES_256_GCM_SHA384"), 6, 2),
+        "",
+        "bulk unbuffered column ----",
+        Column(("bulk-unbuffered", "TLS_ECDHE_RSA_WITH_AES_128_GCM_SHA256"), 6),
+        Column(("bulk-unbuffered", "TLS13_AES_256_GCM_SHA384"), 6, 2),
+        "",
+        "handshakes column ----",
+        Column(("handshakes", "TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384", "no-resume"), 8),
+        Column(
+            (
+                "handshakes",
+                "TLS_ECDHE_ECDSA_WITH_AES_256_GCM_SHA384",
+                "no-resume",
+                "EcdsaP256",
+            ),
+            8,
+        ),
+        Column(("handshakes", "TLS13_AES_256_GCM_SHA384", "no-resume", "Rsa2048"), 8),
+        Column(("handshakes", "TLS13_AES_256_GCM_SHA384", "no-resume", "EcdsaP256"), 8),
+        "",
+        "handshakes unbuffered column ----",
+        Column(
+            (
+                "handshakes-unbuffered",
+                "TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384",
+                "no-resume",
+            ),
+            8,
+        ),
+        Column(
+            (
+                "handshakes-unbuffered",
+                "TLS_ECDHE_ECDSA_WITH_AES_256_GCM_SHA384",
+                "no-resume",
+                "EcdsaP256",
+            ),
+            8,
+        ),
+        Column(
+            (
+                "handshakes-unbuffered",
+                "TLS13_AES_256_GCM_SHA384",
+                "Rsa2048",
+                "no-resume",
+            ),
+            8,
+        ),
+        Column(
+            (
+                "handshakes-unbuffered",
+                "TLS13_AES_256_GCM_SHA384",
+                "no-resume",
+                "EcdsaP256",
+            ),
+            8,
+        ),
+        "",
+        "resume column ----",
+        Column(("handshakes", "TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384", "sessionid"), 8),
+        Column(("handshakes", "TLS13_AES_256_GCM_SHA384", "tickets", "Rsa2048"), 8),
+        "",
+        "resume unbuffered column ----",
+        Column(
+            (
+                "handshakes-unbuffered",
+                "TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384",
+                "sessionid",
+            ),
+            8,
+        ),
+        Column(
+            (
+                "handshakes-unbuffered",
+                "TLS13_AES_256_GCM_SHA384",
+                "tickets",
+                "Rsa2048",
+            ),
+            8,
+        ),
+    ],
+}
+
+
+def extract(file, spec):
+    """
+    Fill every `Column` in `spec` from a single pass over `file`.
+
+    Returns a dict of column -> list of values.
+    """
+    columns = [c for c in spec if isinstance(c, Column)]
+    out = {c: [] for c in columns}
+    # lines are split with their newline, so the last field may have one
+    words = frozenset(w + nl for c in columns for w in c.words for nl in ("", "\n"))
+    # which columns a line belongs to depends only on its length and
+    # which of `words` it has, and few lines differ in those
+    wanted = {}
+
+    with inputs.open_text(file) as lines:
+        for line in lines:
+            parts = line.split("\t")
+            key = len(parts), words.intersection(parts)
+            try:
+                found = wanted[key]
+            except KeyError:
+                fields = set(w.rstrip("\n") for w in key[1])
+                found = wanted[key] = [
+                    (c.field - 1, out[c])
+                    for c in columns
+                    if fields.issuperset(c.words) and len(parts) >= c.field
+                ]
+            for i, values in found:
+                values.append(parts[i])
+
+    for c, values in out.items():
+        out[c] = [v.rstrip("\n") for v in values[: c.limit]]
+    return out
+
+
+if __name__ == "__main__":
+    _, spec, file = sys.argv
+    spec = SPECS[spec]
+
+    values = extract(file, spec)
+    for item in spec:
+        if isinstance(item, Column):
+            if values[item]:
+                print("\n".join(values[item]))
+        else:
+            print(item)
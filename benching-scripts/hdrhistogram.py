@@ -0,0 +1,169 @@
+"""
+Reads HdrHistogram interval logs, as written by HdrHistogram's
+`HistogramLogWriter` (and wrk2, hyperfoil, etc.), merging all the
+histograms in them.
+
+Only the V2 encoding is understood, which is what every current
+HdrHistogram implementation writes.  Memory use is proportional to the
+number of buckets, not the number of samples recorded.
+"""
+
+import base64
+import math
+import struct
+import zlib
+
+import numpy as np
+
+import inputs
+
+COOKIE = 0x1C849303
+COMPRESSED_COOKIE = 0x1C849304
+
+# cookie, payload length, normalizing index offset, significant digits,
+# lowest discernible value, highest trackable value, conversion ratio
+HEADER = struct.Struct(">iiiiqqd")
+
+
+def _cookie_base(cookie):
+    # bits 4-7 hold a word size, which V2 doesn't use
+    return cookie & ~0xF0
+
+
+def _varints(payload):
+    """
+    Decode the ZigZag LEB128 values in `payload` to an int64 array.
+    """
+    b = np.frombuffer(payload, dtype=np.uint8)
+    if len(b) == 0:
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero(b < 0x80)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    lengths = ends - starts + 1
+    if len(ends) == 0 or ends[-1] != len(b) - 1 or lengths.max() > 8:
+        # a ninth byte would carry 8 bits, breaking the scan above;
+        # only counts over 2**55 need one
+        raise ValueError("unsupported or truncated histogram payload")
+
+    shift = 7 * (np.arange(len(b)) - np.repeat(starts, lengths))
+    parts = (b & 0x7F).astype(np.uint64) << shift.astype(np.uint64)
+    zigzag = np.bitwise_or.reduceat(parts, starts).astype(np.int64)
+    return (zigzag >> 1) ^ -(zigzag & 1)
+
+
+class Layout:
+    """
+    The bucket layout of a histogram, mapping count indexes to values.
+    """
+
+    def __init__(self, digits, lowest, ratio):
+        self.key = (digits, lowest, ratio)
+        magnitude = math.ceil(math.log2(2 * 10**digits))
+        self.half_magnitude = max(magnitude, 1) - 1
+        self.unit_magnitude = int(math.floor(math.log2(lowest)))
+        self.ratio = ratio
+
+    def values(self, index):
+        """
+        The middle of the range of values counted at each of `index`.
+        """
+        half = 1 << self.half_magnitude
+        bucket = (index >> self.half_magnitude) - 1
+        sub = (index & (half - 1)) + half
+        sub = np.where(bucket < 0, sub - half, sub)
+        bucket = np.maximum(bucket, 0) + self.unit_magnitude
+        lowest = sub << bucket
+        return (lowest + ((1 << bucket) >> 1)) * self.ratio
+
+
+def decode(encoded):
+    """
+    Return the `Layout`, and the indexes and counts of nonzero buckets,
+    of the base64-encoded compressed histogram `encoded`.
+    """
+    data = base64.b64decode(encoded)
+    cookie, length = struct.unpack_from(">ii", data)
+    if _cookie_base(cookie) != COMPRESSED_COOKIE:
+        raise ValueError("not a V2 compressed histogram (cookie %#x)" % cookie)
+    data = zlib.decompress(data[8 : 8 + length])
+
+    cookie, length, offset, digits, lowest, _, ratio = HEADER.unpack_from(data)
+    if _cookie_base(cookie) != COOKIE:
+        raise ValueError("not a V2 histogram (cookie %#x)" % cookie)
+    if offset != 0:
+        raise ValueError("normalized (shifted) histograms are not supported")
+
+    counts = _varints(data[HEADER.size : HEADER.size + length])
+    # negative entries are runs of that many zero counts
+    steps = np.where(counts < 0, -counts, 1)
+    index = np.cumsum(steps) - steps
+    nonzero = counts > 0
+    return Layout(digits, lowest, ratio), index[nonzero], counts[nonzero]
+
+
+class Histogram:
+    """
+    Counts merged from any number of encoded histograms.
+    """
+
+    def __init__(self):
+        self.layouts = {}
+        self.counts = {}
+
+    def add(self, encoded):
+        layout, index, counts = decode(encoded)
+        self.layouts.setdefault(layout.key, layout)
+        total = self.counts.get(layout.key, np.zeros(0, dtype=np.int64))
+        if len(index) and index[-1] >= len(total):
+            total = np.concatenate(
+                [total, np.zeros(index[-1] + 1 - len(total), dtype=np.int64)]
+            )
+        total[index] += counts
+        self.counts[layout.key] = total
+
+    def values(self):
+        """
+        Return sorted arrays of the distinct values recorded, and how many
+        times each was.
+        """
+        values, counts = [], []
+        for key, total in self.counts.items():
+            (index,) = np.nonzero(total)
+            values.append(self.layouts[key].values(index))
+            counts.append(total[index])
+        if not values:
+            return np.zeros(0), np.zeros(0, dtype=np.int64)
+        values, inverse = np.unique(np.concatenate(values), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate(counts))
+        return values, counts.astype(np.int64)
+
+
+def _intervals(fn):
+    with inputs.open_text(fn) as f:
+        for line in f:
+            if line.startswith(("#", '"', "StartTime", "BaseTime")) or not line.strip():
+                continue
+            fields = line.rstrip().split(",")
+            if fields[0].startswith("Tag="):
+                del fields[0]
+            yield float(fields[0]), fields[-1]
+
+
+def intervals(fn):
+    """
+    Yield the start time, and the values and counts recorded, of each
+    interval histogram in the log `fn`.
+    """
+    for start, encoded in _intervals(fn):
+        layout, index, counts = decode(encoded)
+        yield start, layout.values(index), counts
+
+
+def read_log(fn):
+    """
+    Return a `Histogram` of every interval, of every tag, in the log `fn`.
+    """
+    hist = Histogram()
+    for _, encoded in _intervals(fn):
+        hist.add(encoded)
+    return hist
@@ -0,0 +1,155 @@
+"""
+Opens result files that may be compressed.
+
+Compression is detected from the file's first bytes, not its name.
+Compressed files are decompressed on a background thread, a chunk
+ahead of the reader, so that decompression overlaps parsing.
+
+gzip, xz and bzip2 use the standard library; zstd needs the
+`zstandard` module.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import queue
+import sys
+import threading
+
+MAGIC = [
+    (b"\x1f\x8b", "gzip"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"BZh", "bzip2"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+]
+
+# Tried in turn by `resolve` when a file doesn't exist uncompressed.
+SUFFIXES = (".zst", ".gz", ".xz", ".bz2")
+
+
+def resolve(fn):
+    """
+    Return `fn`, or if that doesn't exist, the first compressed version
+    of it that does.
+    """
+    if fn == "-" or os.path.exists(fn):
+        return fn
+    for suffix in SUFFIXES:
+        if os.path.exists(fn + suffix):
+            return fn + suffix
+    return fn
+
+
+def compression(raw):
+    """
+    Name the compression used by the buffered binary stream `raw`, or
+    None.
+    """
+    head = raw.peek(6)[:6]
+    for magic, kind in MAGIC:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def _decompress(kind, raw):
+    # none of these close `raw` when they are closed; the caller must
+    if kind == "gzip":
+        return gzip.GzipFile(fileobj=raw)
+    if kind == "xz":
+        return lzma.LZMAFile(raw)
+    if kind == "bzip2":
+        return bz2.BZ2File(raw)
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("reading zstd files needs the zstandard module")
+    return zstandard.ZstdDecompressor().stream_reader(raw, closefd=False)
+
+
+class Prefetcher(io.RawIOBase):
+    """
+    A readable stream over `f` which reads ahead by up to `depth`
+    chunks on a background thread.  Closing it closes `f`, then `raw`
+    (the file under `f`), if given.
+    """
+
+    def __init__(self, f, raw=None, chunk=1 << 20, depth=8):
+        self.f = f
+        self.raw = raw
+        self.chunk = chunk
+        self.queue = queue.Queue(depth)
+        self.buf = memoryview(b"")
+        self.eof = False
+        self.stop = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            while not self.stop:
+                data = self.f.read(self.chunk)
+                self.queue.put(data)
+                if not data:
+                    return
+        except BaseException as e:
+            self.queue.put(e)
+
+    def readable(self):
+        return True
+
+    def close(self):
+        if not self.closed:
+            # unblock and stop the reader thread, if the file was not
+            # read to the end
+            self.stop = True
+            while self.thread.is_alive():
+                try:
+                    self.queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            try:
+                self.f.close()
+            finally:
+                if self.raw is not None:
+                    self.raw.close()
+        super().close()
+
+    def readinto(self, b):
+        if not self.buf:
+            if self.eof:
+                return 0
+            item = self.queue.get()
+            if isinstance(item, BaseException):
+                raise item
+            if not item:
+                self.eof = True
+                return 0
+            self.buf = memoryview(item)
+        n = min(len(b), len(self.buf))
+        b[:n] = self.buf[:n]
+        self.buf = self.buf[n:]
+        return n
+
+
+def open_text(fn):
+    """
+    Open `fn` (or stdin, if "-") for reading text, decompressing it if
+    necessary.
+    """
+    fn = resolve(fn)
+    raw = sys.stdin.buffer if fn == "-" else open(fn, "rb")
+    if not isinstance(raw, io.BufferedReader):
+        raw = io.BufferedReader(raw)
+
+    kind = compression(raw)
+    if kind is None:
+        return io.TextIOWrapper(raw)
+    try:
+        f = _decompress(kind, raw)
+    except BaseException:
+        raw.close()
+        raise
+    return io.TextIOWrapper(io.BufferedReader(Prefetcher(f, raw)))
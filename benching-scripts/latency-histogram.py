@@ -1,25 +1,98 @@
+import argparse
+import concurrent.futures
+import functools
+import itertools
+import os
+
 import matplotlib.pyplot as plt
 from matplotlib.ticker import LogLocator, LinearLocator, FuncFormatter
 from matplotlib.scale import InvertedLogTransform
 import numpy as np
 
+import hdrhistogram
+import inputs
+import profiling
+import rebuild
+import sketch
+import weighted
+
 plt.rcParams["svg.fonttype"] = "none"
 plt.rcParams["font.sans-serif"] = ["Arial", "DejaVu Sans"]
 plt.rcParams["font.size"] = 8
 
 
-def read(fn):
-    samples = []
-    for line in open(fn):
-        if not line:
-            continue
-        value = line.split()[1]
-        samples.append(float(value))
+def sample_file(fn):
+    return fn + ".npy"
+
+
+def hdr_log(fn):
+    return os.path.splitext(fn)[0] + ".hlog"
+
+
+def source(fn, samples=True):
+    """
+    The file `read(fn)` reads: `fn`, or if there is neither it nor (with
+    `samples`) a sample file for it, its HdrHistogram log if that exists.
+    """
+    if (
+        (samples and converted(fn))
+        or os.path.exists(inputs.resolve(fn))
+        or not os.path.exists(inputs.resolve(hdr_log(fn)))
+    ):
+        return fn
+    return hdr_log(fn)
+
+
+def parse(fn):
+    with profiling.phase("parse", fn) as p, inputs.open_text(fn) as f:
+        samples = np.loadtxt(f, usecols=1, dtype=np.float64, ndmin=1)
+        p.lines = len(samples)
     return samples
 
 
-def max_bin(samples):
-    return max(max(x) for x in samples)
+def converted(fn):
+    try:
+        return (
+            os.stat(sample_file(fn)).st_mtime_ns
+            >= os.stat(inputs.resolve(fn)).st_mtime_ns
+        )
+    except FileNotFoundError:
+        return os.path.exists(sample_file(fn)) and not os.path.exists(
+            inputs.resolve(fn)
+        )
+
+
+# microseconds per HdrHistogram value unit
+HDR_UNITS = {"ns": 1e-3, "us": 1.0, "ms": 1e3}
+
+
+def read(fn, hdr_unit="us"):
+    """
+    Return the latency samples in `fn` as a float64 array, and None; or
+    if `fn` is only available as an HdrHistogram log (recorded in
+    `hdr_unit`s), the distinct values recorded there and their counts.
+
+    If a sample file written by `convert` is at least as new as `fn`,
+    that is memory-mapped instead of parsing the TSV.
+    """
+    if source(fn) != fn:
+        with profiling.phase("hdr-read", source(fn)):
+            values, counts = hdrhistogram.read_log(source(fn)).values()
+        return values * HDR_UNITS[hdr_unit], counts
+    if converted(fn):
+        with profiling.phase("npy-load", sample_file(fn)):
+            return np.load(sample_file(fn), mmap_mode="r"), None
+    return parse(fn), None
+
+
+def convert(fn):
+    """
+    Write the samples from `fn` to a `.npy` file next to it.
+    """
+    tmp = sample_file(fn) + ".tmp"
+    with profiling.phase("convert", fn), open(tmp, "wb") as f:
+        np.save(f, parse(fn))
+    os.replace(tmp, sample_file(fn))
 
 
 order = ("rustls 0.23.16", "OpenSSL 3.0.14", "OpenSSL 3.4.0", "BoringSSL")
@@ -33,62 +106,56 @@ def format_micros(us):
         return "{:.02f}µs".format(us)
 
 
-def stats(samples, title):
+def stats(samples, counts, title):
+    q = [5, 50, 90, 99]
+    with profiling.phase("percentiles"):
+        if counts is None:
+            percentiles = np.percentile(samples, q)
+        else:
+            percentiles = weighted.percentile(samples, counts, q)
     return dict(
         rowLabels="P5 P50 P90 P99".split(),
-        cellText=[
-            [format_micros(np.percentile(samples, 5))],
-            [format_micros(np.percentile(samples, 50))],
-            [format_micros(np.percentile(samples, 90))],
-            [format_micros(np.percentile(samples, 99))],
-        ],
+        cellText=[[format_micros(p)] for p in percentiles],
     )
 
 
-for out_file, title, samples in [
+IMPLS = ("rustls", "openssl-3.0.14", "openssl-3.4.0", "boringssl")
+
+JOBS = [
     (
         "latency-resume-tls13-server.svg",
         "TLS1.3 server resumption",
-        [
-            read("rustls/latency-resume-tls13-server.tsv"),
-            read("openssl-3.0.14/latency-resume-tls13-server.tsv"),
-            read("openssl-3.4.0/latency-resume-tls13-server.tsv"),
-            read("boringssl/latency-resume-tls13-server.tsv"),
-        ],
+        [impl + "/latency-resume-tls13-server.tsv" for impl in IMPLS],
     ),
     (
         "latency-resume-tls12-server.svg",
         "TLS1.2 server resumption",
-        [
-            read("rustls/latency-resume-tls12-server.tsv"),
-            read("openssl-3.0.14/latency-resume-tls12-server.tsv"),
-            read("openssl-3.4.0/latency-resume-tls12-server.tsv"),
-            read("boringssl/latency-resume-tls12-server.tsv"),
-        ],
+        [impl + "/latency-resume-tls12-server.tsv" for impl in IMPLS],
     ),
     (
         "latency-fullhs-tls13-server.svg",
         "TLS1.3 server full handshakes",
-        [
-            read("rustls/latency-fullhs-tls13-server.tsv"),
-            read("openssl-3.0.14/latency-fullhs-tls13-server.tsv"),
-            read("openssl-3.4.0/latency-fullhs-tls13-server.tsv"),
-            read("boringssl/latency-fullhs-tls13-server.tsv"),
-        ],
+        [impl + "/latency-fullhs-tls13-server.tsv" for impl in IMPLS],
     ),
     (
         "latency-fullhs-tls12-server.svg",
         "TLS1.2 server full handshakes",
-        [
-            read("rustls/latency-fullhs-tls12-server.tsv"),
-            read("openssl-3.0.14/latency-fullhs-tls12-server.tsv"),
-            read("openssl-3.4.0/latency-fullhs-tls12-server.tsv"),
-            read("boringssl/latency-fullhs-tls12-server.tsv"),
-        ],
+        [impl + "/latency-fullhs-tls12-server.tsv" for impl in IMPLS],
     ),
-]:
-    bins = np.histogram_bin_edges(np.log10(samples), bins=128)
-    width = (bins[1] - bins[0]) * 0.9
+]
+
+
+def render(out_file, title, samples):
+    """
+    Draw `samples`, a list of (values, counts) per implementation, where
+    counts is None for raw samples.
+    """
+    samples, counts = zip(*samples)
+    with profiling.phase("bins", out_file):
+        logs = [np.log10(s) for s in samples]
+        bins = np.histogram_bin_edges(np.concatenate(logs), bins=128)
+        width = (bins[1] - bins[0]) * 0.9
+        xmin = np.floor(min(np.min(l) for l in logs))
 
     f, plots = plt.subplots(4, sharex=True)
 
@@ -98,10 +165,10 @@ for out_file, title, samples in [
             return "0"
         return "{:}K".format(value // 1000)
 
-    for plot, samp, impl, colour in zip(plots, samples, order, colours):
+    for plot, log, weights, impl, colour in zip(plots, logs, counts, order, colours):
         # linear.set_ylabel("freq")
         # linear.hist(samp, bins=bins, width=width, color=colour)
-        plot.hist(np.log10(samp), bins=bins, width=width, color=colour)
+        plot.hist(log, bins=bins, width=width, color=colour, weights=weights)
         plot.set_ylabel(impl)
         plot.yaxis.set_minor_formatter(FuncFormatter(format_y_axis))
         plot.yaxis.set_major_formatter(FuncFormatter(format_y_axis))
@@ -124,23 +191,221 @@ for out_file, title, samples in [
         tab = plt.table(
             bbox=[1.05, 3.1 - (1 * i), 0.15, 0.9],
             edges="open",
-            **stats(samples[i], order[i]),
+            **stats(samples[i], counts[i], order[i]),
         )
         tab.set_fontsize(8)
 
     f.text(
         x=0.8,
         y=0.05,
-        s="N = {}".format(len(samples[i])),
+        s="N = {}".format(
+            len(samples[i]) if counts[i] is None else int(np.sum(counts[i]))
+        ),
     )
 
     for p in plots:
         p.set_ylim(ymin=0)
-        p.set_xlim(xmin=np.floor(np.min(np.log10(samples))))
+        p.set_xlim(xmin=xmin)
         p.grid(axis="x", which="both")
     f.subplots_adjust(hspace=0, left=0.1, right=0.85)
     # f.legend(order, color=colours)
     f.suptitle(title + " latency distribution")
     f.align_ylabels()
     f.set_size_inches(9, 6)
-    plt.savefig(out_file, format="svg")
+    profiling.savefig(out_file, format="svg")
+    plt.close(f)
+
+
+def render_job(job, hdr_unit="us"):
+    out_file, title, files = job
+    samples = [read(fn, hdr_unit) for fn in files]
+    with profiling.phase("draw", out_file):
+        render(out_file, title, samples)
+    return out_file
+
+
+QUANTILES = (("P50", 0.5), ("P99", 0.99), ("P99.9", 0.999))
+
+
+def over_time_file(out_file):
+    return os.path.splitext(out_file)[0] + "-over-time.svg"
+
+
+def tsv_chunks(fn, chunk=1_000_000):
+    """
+    Yield the first two columns of `fn` as arrays, and None for their
+    counts, a chunk of lines at a time.
+    """
+    with inputs.open_text(fn) as f:
+        while True:
+            lines = list(itertools.islice(f, chunk))
+            if not lines:
+                return
+            rows = np.loadtxt(lines, usecols=(0, 1), dtype=np.float64, ndmin=2)
+            yield rows[:, 0], rows[:, 1], None
+
+
+def over_time(fn, window, hdr_unit="us"):
+    """
+    Return the start of each `window`-wide range of the first column of
+    `fn` (or of interval start times, for an HdrHistogram log), and an
+    array of the QUANTILES of the latencies in each.
+
+    This is one pass over `fn`, keeping a sketch only of windows which
+    may still receive samples; so the first column must not decrease.
+    """
+    # the sample file lacks the first column
+    if source(fn, samples=False) == fn:
+        chunks = tsv_chunks(fn)
+    else:
+        chunks = (
+            (np.full(len(values), start), values * HDR_UNITS[hdr_unit], counts)
+            for start, values, counts in hdrhistogram.intervals(hdr_log(fn))
+        )
+
+    qs = [q for _, q in QUANTILES]
+    pending, done = {}, {}
+    with profiling.phase("over-time", source(fn, samples=False)) as p:
+        for positions, values, counts in chunks:
+            if len(values) == 0:
+                continue
+            if counts is None:
+                p.lines += len(values)
+            ids = np.floor(positions / window).astype(np.int64)
+            order = np.argsort(ids, kind="stable")
+            keys, starts = np.unique(ids[order], return_index=True)
+            for key, part in zip(keys, np.split(order, starts[1:])):
+                if key in done:
+                    raise ValueError("%s: first column is not in order" % fn)
+                pending.setdefault(key, sketch.DDSketch()).add(
+                    values[part], None if counts is None else counts[part]
+                )
+            for key in [k for k in pending if k < keys[-1]]:
+                done[key] = pending.pop(key).quantiles(qs)
+    for key, s in pending.items():
+        done[key] = s.quantiles(qs)
+
+    keys = sorted(done)
+    return np.array(keys) * window, np.array([done[k] for k in keys])
+
+
+def render_over_time(out_file, title, series):
+    """
+    Draw `series`, a list of (window starts, quantiles) per
+    implementation.
+    """
+    f, plots = plt.subplots(4, sharex=True)
+
+    for plot, (starts, quantiles), impl, colour in zip(plots, series, order, colours):
+        for (label, _), ys, style in zip(
+            QUANTILES, quantiles.T, ("solid", "dashed", "dotted")
+        ):
+            plot.plot(
+                starts, ys, color=colour, linestyle=style, linewidth=0.8, label=label
+            )
+        plot.set_ylabel(impl)
+        plot.set_yscale("log")
+        plot.yaxis.set_major_locator(LogLocator(subs=(1.0, 2.0, 5.0)))
+        plot.yaxis.set_major_formatter(FuncFormatter(lambda y, _: format_micros(y)))
+        plot.yaxis.set_minor_formatter(FuncFormatter(lambda y, _: ""))
+        plot.grid(axis="y", which="major")
+
+    plots[0].legend(loc="upper right", ncols=len(QUANTILES))
+    plots[-1].set_xlabel("Sample (first column)")
+    f.subplots_adjust(hspace=0, left=0.1, right=0.95)
+    f.suptitle(title + " latency over time")
+    f.align_ylabels()
+    f.set_size_inches(9, 6)
+    profiling.savefig(out_file, format="svg")
+    plt.close(f)
+
+
+def render_over_time_job(job, window, hdr_unit="us"):
+    out_file, title, files = job
+    series = [over_time(fn, window, hdr_unit) for fn in files]
+    with profiling.phase("draw", out_file):
+        render_over_time(out_file, title, series)
+    return out_file
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--convert",
+        action="store_true",
+        help="Write a .npy sample file next to each TSV, which later runs memory-map instead of parsing the TSV.",
+    )
+    ap.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Render this many figures at once, in separate processes.  Samples are converted to .npy first and memory-mapped by each worker.",
+    )
+    ap.add_argument(
+        "--force",
+        action="store_true",
+        help="Render every figure, even those whose inputs and definition are unchanged.",
+    )
+    ap.add_argument(
+        "--hdr-unit",
+        choices=HDR_UNITS,
+        default="us",
+        help="Unit of the values in HdrHistogram logs, which are read in place of missing TSVs (default us).",
+    )
+    ap.add_argument(
+        "--over-time",
+        type=float,
+        metavar="WINDOW",
+        help="Instead, plot P50/P99/P99.9 over each WINDOW of the TSVs' first column (sample number or timestamp), to *-over-time.svg.  Reads each TSV once, in bounded memory.",
+    )
+    profiling.add_arguments(ap)
+    opts = ap.parse_args()
+    profiling.start(opts)
+    if opts.jobs > 1 and (opts.profile or opts.profile_stats or opts.profile_json):
+        ap.error("--profile only sees work done in this process; use --jobs 1")
+
+    build = rebuild.Build(force=opts.force)
+    if opts.over_time:
+        jobs = [(over_time_file(out), title, files) for out, title, files in JOBS]
+        definition = rebuild.definition(render_over_time_job) + repr(opts.over_time)
+        job = functools.partial(
+            render_over_time_job, window=opts.over_time, hdr_unit=opts.hdr_unit
+        )
+    else:
+        jobs = JOBS
+        definition = rebuild.definition(render_job)
+        job = functools.partial(render_job, hdr_unit=opts.hdr_unit)
+    specs = {j[0]: definition + repr(j) + opts.hdr_unit for j in jobs}
+
+    def sources(files):
+        return [source(fn, samples=not opts.over_time) for fn in files]
+
+    todo = [
+        (out_file, title, files)
+        for out_file, title, files in jobs
+        if build.stale(out_file, [out_file], sources(files), specs[out_file])
+    ]
+
+    if not opts.over_time and (opts.convert or opts.jobs > 1):
+        for fn in sorted(set(fn for _, _, files in todo for fn in files)):
+            # HdrHistogram logs are already small enough to just read
+            if source(fn) == fn and (opts.convert or not converted(fn)):
+                convert(fn)
+
+    inputs_of = {out_file: files for out_file, _, files in todo}
+
+    def record(out_file):
+        build.drawn(out_file, sources(inputs_of[out_file]), specs[out_file])
+        print("drew", out_file, flush=True)
+
+    if opts.jobs > 1:
+        with concurrent.futures.ProcessPoolExecutor(opts.jobs) as pool:
+            # each job returns the figure it drew; record them in the
+            # order they finish, not the order they were submitted
+            futures = [pool.submit(job, j) for j in todo]
+            for future in concurrent.futures.as_completed(futures):
+                record(future.result())
+    else:
+        for j in todo:
+            record(job(j))
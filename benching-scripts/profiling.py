@@ -0,0 +1,188 @@
+"""
+Optional profiling of the phases of the scripts in this directory.
+
+Scripts take `--profile`, `--profile-stats` and `--profile-json` (see
+`add_arguments`) and pass their options to `start`.  Code wraps each phase of its work in
+
+    with profiling.phase("parse", fn) as p:
+        ...
+
+optionally counting the lines it reads with `p.count(lines)`.  Once
+enabled, a table of each phase's wall and CPU time, lines and peak RSS,
+per input file, is printed to stderr at exit; and if a pstats file was
+named, the whole run is profiled with cProfile into it.  With just
+`--profile-json`, the totals per phase (over all files) are written as
+JSON instead, for bench.py.
+
+Phases that draw figures are called "draw", and include everything
+done after the inputs are read, so that reading and drawing can be
+told apart.
+
+Phases may nest, in which case the outer phase's times include the
+inner's.  When not enabled, phases cost next to nothing.
+"""
+
+import atexit
+import contextlib
+import cProfile
+import json
+import resource
+import sys
+import time
+
+# (phase, file) -> [calls, wall, cpu, lines, peak RSS]; None if disabled
+_totals = None
+
+
+def add_arguments(ap):
+    ap.add_argument(
+        "--profile",
+        action="store_true",
+        help="On exit, print the time, lines read and peak memory of each phase of the work (per input file) to stderr.",
+    )
+    ap.add_argument(
+        "--profile-stats",
+        metavar="PSTATS",
+        help="Implies --profile, and also writes a cProfile of the whole run to PSTATS.",
+    )
+    ap.add_argument(
+        "--profile-json",
+        metavar="FILE",
+        help="Like --profile, but writes the totals for each phase to FILE as JSON instead of printing them.",
+    )
+
+
+def start(opts):
+    """
+    Enable profiling if `opts` (from `add_arguments`) ask for it.
+    """
+    global _totals
+    if not (opts.profile or opts.profile_stats or opts.profile_json):
+        return
+    _totals = {}
+    if opts.profile_json:
+        atexit.register(dump, opts.profile_json)
+    if opts.profile_stats:
+        profile = cProfile.Profile()
+        profile.enable()
+        atexit.register(profile.dump_stats, opts.profile_stats)
+        atexit.register(profile.disable)
+    if opts.profile or opts.profile_stats:
+        atexit.register(report)
+
+
+def max_rss_kb(usage=None):
+    """
+    Peak RSS in KiB, from `usage` (as from `resource.getrusage` or
+    `os.wait4`), or by default that of this process.
+    """
+    if usage is None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    return usage.ru_maxrss // (1024 if sys.platform == "darwin" else 1)
+
+
+class Phase:
+    def __init__(self):
+        self.lines = 0
+
+    def count(self, lines):
+        """
+        Return `lines`, counting them into this phase as they are
+        iterated over if profiling is enabled.
+        """
+        if _totals is None:
+            return lines
+        return self._count(lines)
+
+    def _count(self, lines):
+        for line in lines:
+            self.lines += 1
+            yield line
+
+
+@contextlib.contextmanager
+def phase(name, file=None):
+    p = Phase()
+    if _totals is None:
+        yield p
+        return
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield p
+    finally:
+        t = _totals.setdefault((name, file), [0, 0.0, 0.0, 0, 0])
+        t[0] += 1
+        t[1] += time.perf_counter() - wall
+        t[2] += time.process_time() - cpu
+        t[3] += p.lines
+        t[4] = max(t[4], max_rss_kb())
+
+
+def savefig(fn, **kwargs):
+    """
+    `plt.savefig`, as a phase.
+    """
+    import matplotlib.pyplot as plt
+
+    with phase("savefig", fn):
+        plt.savefig(fn, **kwargs)
+
+
+def dump(fn):
+    """
+    Write the totals for each phase, summed over files, to `fn` as JSON.
+    """
+    phases = {}
+    for (name, _), (calls, wall, cpu, lines, rss) in _totals.items():
+        p = phases.setdefault(
+            name, dict(calls=0, wall_s=0.0, cpu_s=0.0, lines=0, max_rss_kb=0)
+        )
+        p["calls"] += calls
+        p["wall_s"] += wall
+        p["cpu_s"] += cpu
+        p["lines"] += lines
+        p["max_rss_kb"] = max(p["max_rss_kb"], rss)
+    with open(fn, "w") as f:
+        json.dump(phases, f)
+
+
+def report(out=sys.stderr):
+    """
+    Print the totals for each phase, in the order they first ran.
+
+    Peak RSS is that of the whole process, as of the end of the phase.
+    """
+    width = max([len(str(file)) for _, file in _totals] + [4])
+    print(
+        "%-12s %-*s %6s %9s %9s %10s %10s %10s"
+        % (
+            "phase",
+            width,
+            "file",
+            "calls",
+            "wall s",
+            "cpu s",
+            "lines",
+            "lines/s",
+            "peak KiB",
+        ),
+        file=out,
+    )
+    for (name, file), (calls, wall, cpu, lines, rss) in _totals.items():
+        print(
+            "%-12s %-*s %6d %9.3f %9.3f %10s %10s %10d"
+            % (
+                name,
+                width,
+                "-" if file is None else file,
+                calls,
+                wall,
+                cpu,
+                lines or "",
+                "%d" % (lines / wall) if lines and wall else "",
+                rss,
+            ),
+            file=out,
+        )
@@ -0,0 +1,174 @@
+"""
+Tracks which figures need redrawing.
+
+A figure is redrawn when its outputs are missing, or when the digest of
+its definition (see `definition`) or of any of its input files differs
+from when it was last drawn.  Input digests are SHA-256 of the file
+contents, only recomputed when a file's size or mtime changes.
+
+State is kept in a JSON file in the current directory, alongside the
+figures.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import sys
+import types
+
+import inputs
+
+STATE_FILE = ".figures.json"
+
+
+def _file_digest(fn):
+    h = hashlib.sha256()
+    with open(fn, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _names(code):
+    yield from code.co_names
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from _names(const)
+
+
+def _module_source(module, here, seen):
+    """
+    Return the source of `module`, if it is one of the scripts in
+    directory `here`, and of those of them it imports in turn.
+    """
+    path = getattr(module, "__file__", None)
+    if path is None or os.path.dirname(os.path.abspath(path)) != here:
+        return ""
+    key = "module " + module.__name__
+    if key in seen:
+        return ""
+    seen.add(key)
+    out = ["# %s\n" % module.__name__, inspect.getsource(module)]
+    for value in vars(module).values():
+        if isinstance(value, types.ModuleType):
+            out.append(_module_source(value, here, seen))
+        elif isinstance(value, (types.FunctionType, type)):
+            out.append(_module_source(sys.modules.get(value.__module__), here, seen))
+    return "".join(out)
+
+
+def definition(fn, seen=None):
+    """
+    Return a string describing what `fn` draws: its source, plus that
+    of any functions in its module it calls and the value of any plain
+    constants it uses, and the whole source of any modules alongside
+    its own that it uses (and that they import).
+
+    Flags (bools) are left out: they are usually set from options, so
+    callers should add those that matter themselves.
+    """
+    if seen is None:
+        seen = set()
+    seen.add(fn.__name__)
+    here = os.path.dirname(os.path.abspath(inspect.getfile(fn)))
+    out = [inspect.getsource(fn)]
+    for name in sorted(set(_names(fn.__code__))):
+        if name in seen or name not in fn.__globals__:
+            continue
+        value = fn.__globals__[name]
+        if isinstance(value, types.ModuleType):
+            out.append(_module_source(value, here, seen))
+        elif (
+            isinstance(value, types.FunctionType) and value.__module__ == fn.__module__
+        ):
+            out.append(definition(value, seen))
+        elif isinstance(value, (types.FunctionType, type)):
+            if value.__module__ != fn.__module__:
+                module = sys.modules.get(value.__module__)
+                out.append(_module_source(module, here, seen))
+        elif isinstance(value, bool):
+            continue
+        elif isinstance(value, (str, int, float, tuple, list, dict)):
+            seen.add(name)
+            out.append("%s = %r\n" % (name, value))
+    return "".join(out)
+
+
+class Build:
+    def __init__(self, state_file=STATE_FILE, force=False):
+        self.state_file = state_file
+        self.force = force
+        try:
+            with open(state_file) as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = {}
+        for k in ("inputs", "figures", "series"):
+            self.state.setdefault(k, {})
+
+    def input_digest(self, fn):
+        path = inputs.resolve(fn)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        stat = [path, st.st_mtime_ns, st.st_size]
+        known = self.state["inputs"].get(fn)
+        if known is None or known[0] != stat:
+            known = [stat, _file_digest(path)]
+            self.state["inputs"][fn] = known
+        return known[1]
+
+    def digest(self, inputs, definition):
+        h = hashlib.sha256(definition.encode())
+        for fn in sorted(set(inputs)):
+            h.update(("\0%s\0%s" % (fn, self.input_digest(fn))).encode())
+        return h.hexdigest()
+
+    def stale(self, name, outputs, inputs, definition):
+        """
+        True if figure `name` needs redrawing.
+        """
+        if self.force or not all(os.path.exists(o) for o in outputs):
+            return True
+        return self.state["figures"].get(name) != self.digest(inputs, definition)
+
+    def drawn(self, name, inputs, definition):
+        self.state["figures"][name] = self.digest(inputs, definition)
+        self.save()
+
+    def series(self, queries, read):
+        """
+        Return the series for `queries` (a dict of name ->
+        (file, *tags)), reusing those memoised from earlier runs whose
+        input file has not changed.
+
+        `read` is called with a dict of just the queries that need
+        reading, and must return a dict of name -> (x, y).  With
+        `force`, everything is read afresh.
+        """
+        out = {}
+        missing = {}
+        for name, query in queries.items():
+            key = json.dumps(query)
+            memo = None if self.force else self.state["series"].get(key)
+            if memo is not None and memo["input"] == self.input_digest(query[0]):
+                out[name] = tuple(memo["xy"])
+            else:
+                missing[name] = query
+
+        if missing:
+            for name, xy in read(missing).items():
+                query = missing[name]
+                self.state["series"][json.dumps(query)] = dict(
+                    input=self.input_digest(query[0]), xy=xy
+                )
+                out[name] = xy
+        return out
+
+    def save(self):
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.state_file)
@@ -0,0 +1,93 @@
+"""
+A DDSketch: a mergeable summary of a stream of positive values, from
+which any quantile can be estimated to within a fixed relative error.
+
+Values are counted in logarithmically-sized buckets, so the size of a
+sketch depends only on the dynamic range of the values (about 700
+buckets for 1µs-1s at 1% accuracy), not on how many were added.
+
+See Masson, Rim & Lee, "DDSketch: A Fast and Fully-Mergeable Quantile
+Sketch with Relative-Error Guarantees", VLDB 2019.
+"""
+
+import math
+
+import numpy as np
+
+
+class DDSketch:
+    def __init__(self, accuracy=0.01):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        # counts[i] is of values with key offset + i
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+        # values <= 0, which have no key
+        self.zeros = 0
+
+    @property
+    def count(self):
+        return int(self.counts.sum()) + self.zeros
+
+    def _grow(self, low, high):
+        if len(self.counts) == 0:
+            self.offset = low
+            self.counts = np.zeros(high - low + 1, dtype=np.int64)
+            return
+        low = min(low, self.offset)
+        high = max(high, self.offset + len(self.counts) - 1)
+        if low == self.offset and high - low + 1 == len(self.counts):
+            return
+        counts = np.zeros(high - low + 1, dtype=np.int64)
+        start = self.offset - low
+        counts[start : start + len(self.counts)] = self.counts
+        self.offset, self.counts = low, counts
+
+    def add(self, values, weights=None):
+        """
+        Add each of the array `values`, `weights[i]` times if given.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if weights is None:
+            weights = np.ones(len(values), dtype=np.int64)
+        positive = values > 0
+        self.zeros += int(np.sum(weights[~positive]))
+        values, weights = values[positive], weights[positive]
+        if len(values) == 0:
+            return
+        keys = np.ceil(np.log(values) / self.log_gamma).astype(np.int64)
+        low, high = int(keys.min()), int(keys.max())
+        self._grow(low, high)
+        start = low - self.offset
+        counts = np.bincount(keys - low, weights=weights).astype(np.int64)
+        self.counts[start : start + high - low + 1] += counts
+
+    def merge(self, other):
+        """
+        Add everything in `other`, which must have the same accuracy.
+        """
+        if other.gamma != self.gamma:
+            raise ValueError("can only merge sketches of the same accuracy")
+        self.zeros += other.zeros
+        if len(other.counts) == 0:
+            return
+        self._grow(other.offset, other.offset + len(other.counts) - 1)
+        start = other.offset - self.offset
+        self.counts[start : start + len(other.counts)] += other.counts
+
+    def quantiles(self, qs):
+        """
+        Estimate the quantiles `qs` (each in [0, 1]) of the values added,
+        as an array.  NaN if nothing has been.
+        """
+        qs = np.asarray(qs, dtype=np.float64)
+        total = self.count
+        if total == 0:
+            return np.full(qs.shape, np.nan)
+        rank = qs * (total - 1)
+        ends = self.zeros + np.cumsum(self.counts)
+        index = np.minimum(np.searchsorted(ends, rank, side="right"), len(ends) - 1)
+        keys = self.offset + index
+        values = 2 * np.power(self.gamma, keys) / (self.gamma + 1)
+        return np.where(rank < self.zeros, 0.0, values)
@@ -1,4 +1,28 @@
-import sys
+import argparse
+import itertools
+import json
+import mmap
+import operator
+import os
+import time
+
+import numpy as np
+
+import inputs
+import profiling
+
+# Bump when the on-disk index layout changes.
+INDEX_VERSION = 2
+
+# A column with more distinct values than this holds measurements, not
+# tags, and isn't indexed.
+MAX_TAGS = 1024
+
+# Lines are parsed about this many bytes at a time.
+CHUNK = 1 << 22
+
+# Set by --no-cache: always scan the text, as for compressed files.
+use_cache = True
 
 
 def extract_which(name, parts, default=None):
@@ -17,25 +41,503 @@ def eq(v, p):
         return True
 
 
+def matches(parts, tags):
+    return all(eq(p, t) for p, t in zip(parts, tags))
+
+
+def _decode(field):
+    # as text mode reads it
+    if field.endswith(b"\r\n"):
+        field = field[:-2] + b"\n"
+    return field.decode()
+
+
+class Index:
+    """
+    Columnar index of a tab-separated result file.
+
+    `rows` has, for each non-blank line, its byte offset in the file and
+    the code of each indexed column's value: its position in that
+    column's string table `tables[i]`, or -1 if the line is too short to
+    have the column.  Columns with too many distinct values to be tags
+    have no table (None), and aren't indexed.
+    """
+
+    def __init__(self, file, rows, tables):
+        self.file = file
+        self.rows = rows
+        self.tables = tables
+        self.codes = {}
+        for i, table in enumerate(tables):
+            if table is not None:
+                self.codes[i] = (len(self.codes), {v: c for c, v in enumerate(table)})
+
+    def match(self, tags):
+        """
+        Return the rows that match `tags` in the indexed columns, and
+        whether they need checking against tags in other columns.
+
+        Like `zip(parts, tags)`, a tag only constrains rows that have a
+        field at its position.
+        """
+        mask = np.ones(len(self.rows), dtype=bool)
+        check = False
+        for i, t in enumerate(tags):
+            if t == "?" or i >= len(self.tables):
+                continue
+            if i not in self.codes:
+                check = True
+                continue
+            j, codes = self.codes[i]
+            column = self.rows["codes"][:, j]
+            hit = column == -1
+            if t in codes:
+                hit |= column == codes[t]
+            mask &= hit
+        return np.flatnonzero(mask), check
+
+    def select(self, queries, convert=list):
+        """
+        Return the lines matching each of `queries` (lists of tags),
+        split into fields, and passed to `convert` as a list.
+        """
+        if not len(self.rows):
+            return [convert([]) for _ in queries]
+        results = []
+        with open(self.file, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mm:
+            for tags in queries:
+                rows, check = self.match(tags)
+                match = _matcher(tags)
+                out = []
+                for offset in self.rows["offset"][rows].tolist():
+                    end = mm.find(b"\n", offset) + 1 or len(mm)
+                    parts = _decode(mm[offset:end]).split("\t")
+                    if not check or match(parts):
+                        out.append(parts)
+                results.append(convert(out))
+        return results
+
+
+def index_file(file):
+    return file + ".slice"
+
+
+def _stat_key(file):
+    st = os.stat(file)
+    return [st.st_mtime_ns, st.st_size]
+
+
+# Bytes that `str.strip` removes.
+_SPACE = np.frombuffer(b" \t\n\r\x0b\x0c", np.uint8)
+
+# The low n bytes of a little-endian word, for n = 0 ... 8.
+_MASKS = np.array([(1 << 8 * n) - 1 for n in range(9)], np.uint64)
+
+# Odd, so multiplying by it mod 2**64 loses nothing.
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _fields(data):
+    """
+    Split `data` (whole lines) into fields.
+
+    Returns, for each non-blank line, its start and the number of its
+    first field and of its fields; for every field, its start and end;
+    and `data` as an array of the (unaligned) 8-byte words starting at
+    each byte, for `_hash`.  A line's last field includes its newline,
+    as `iter_all` gives it.
+    """
+    text = data if data.endswith(b"\n") else data + b"\n"
+    buf = np.frombuffer(text, np.uint8)
+    sep = np.flatnonzero(buf - np.uint8(9) < 2)  # tab or newline
+    last = buf[sep] == 10
+    start = np.empty_like(sep)
+    start[0] = 0
+    start[1:] = sep[:-1] + 1
+    end = np.minimum(sep + last, len(data))
+    first = np.flatnonzero(np.concatenate([[True], last[:-1]]))
+    width = np.diff(first, append=len(sep))
+    lines = start[first]
+
+    # skip lines of only whitespace, like `line.strip() == ""`: only
+    # those starting with some need looking at
+    keep = np.ones(len(lines), bool)
+    for n in np.flatnonzero(np.isin(buf[lines], _SPACE)).tolist():
+        keep[n] = bool(data[lines[n] : end[first[n] + width[n] - 1]].strip())
+
+    words = np.ndarray((len(text) + 1,), "<u8", text + bytes(8), 0, (1,))
+    return lines[keep], first[keep], width[keep], start, end, words
+
+
+def _hash(words, start, end):
+    """
+    A 64-bit hash of the bytes of each field from `start` to `end`,
+    taking them 8 at a time from `words` (see `_fields`).
+    """
+    length = end - start
+    digest = words[start] & _MASKS[np.minimum(length, 8)]
+    longer = np.flatnonzero(length > 8)
+    for k in itertools.count(8, 8):
+        if not len(longer):
+            break
+        more = length[longer] - k
+        word = words[start[longer] + k] & _MASKS[np.minimum(more, 8)]
+        digest[longer] = digest[longer] * _MIX + word
+        longer = longer[more > 8]
+    return digest * _MIX + length.astype(np.uint64)
+
+
+class _Tags:
+    """
+    The distinct values found so far in one column of a file, and the
+    code of each.
+    """
+
+    def __init__(self):
+        self.values = []
+        self.hashes = np.empty(0, np.uint64)  # sorted
+        self.codes = np.empty(0, np.int16)  # by hash
+
+    def encode(self, digest, data, start, end):
+        """
+        Return the codes of the fields of `data` from `start` to `end`,
+        whose hashes are `digest`, giving new values the next codes; or
+        None if that would be too many.
+        """
+        pos = np.searchsorted(self.hashes, digest)
+        known = pos < len(self.hashes)
+        known[known] = self.hashes[pos[known]] == digest[known]
+        if not known.all():
+            new, at = np.unique(digest[~known], return_index=True)
+            if len(self.values) + len(new) > MAX_TAGS:
+                return None
+            for a in np.flatnonzero(~known)[at].tolist():
+                self.values.append(data[start[a] : end[a]])
+            hashes = np.concatenate([self.hashes, new])
+            codes = np.concatenate(
+                [
+                    self.codes,
+                    np.arange(len(self.codes), len(self.values), dtype=np.int16),
+                ]
+            )
+            order = np.argsort(hashes)
+            self.hashes, self.codes = hashes[order], codes[order]
+            pos = np.searchsorted(self.hashes, digest)
+        return self.codes[pos]
+
+
+def _build(file):
+    """
+    Parse `file`, returning the `rows` and `tables` of its `Index`.
+    """
+    offsets = []
+    columns = []  # per column, arrays of codes by chunk; None if not indexed
+    tags = []  # per column, a _Tags; None if not indexed
+    count = 0
+    offset = 0
+    with profiling.phase("parse", file) as p, open(file, "rb") as f:
+        for data in iter(lambda: f.read(CHUNK), b""):
+            if not data.endswith(b"\n"):
+                data += f.readline()
+            lines, first, width, start, end, words = _fields(data)
+            p.lines += len(lines)
+            offsets.append(offset + lines)
+            offset += len(data)
+
+            for i in range(max(int(width.max(initial=0)), len(tags))):
+                if i == len(tags):
+                    tags.append(_Tags())
+                    columns.append([np.full(count, -1, np.int16)])
+                if tags[i] is None:
+                    continue
+                # the lines with an i'th field, and those fields
+                has = np.flatnonzero(width > i)
+                at = first[has] + i
+                found = tags[i].encode(
+                    _hash(words, start[at], end[at]), data, start[at], end[at]
+                )
+                if found is None:
+                    tags[i] = columns[i] = None
+                    continue
+                codes = np.full(len(lines), -1, np.int16)
+                codes[has] = found
+                columns[i].append(codes)
+            count += len(lines)
+
+    indexed = [i for i, t in enumerate(tags) if t is not None]
+    rows = np.empty(count, dtype=[("offset", "<i8"), ("codes", "<i2", (len(indexed),))])
+    rows["offset"] = np.concatenate(offsets) if offsets else []
+    for j, i in enumerate(indexed):
+        rows["codes"][:, j] = np.concatenate(columns[i])
+    tables = [None if t is None else [_decode(v) for v in t.values] for t in tags]
+    return rows, tables
+
+
+def _save(file, key, rows, tables):
+    path = index_file(file)
+    try:
+        with open(path + ".npy.tmp", "wb") as f:
+            np.save(f, rows)
+        with open(path + ".tmp", "w") as f:
+            json.dump(
+                dict(version=INDEX_VERSION, key=key, rows=len(rows), tables=tables),
+                f,
+            )
+        # the tables last, as they say whether the rows are up to date
+        os.replace(path + ".npy.tmp", path + ".npy")
+        os.replace(path + ".tmp", path)
+    except OSError:
+        # read-only result directories just go without a cache
+        pass
+    finally:
+        for tmp in (path + ".npy.tmp", path + ".tmp"):
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+
+def load(file):
+    """
+    Return the `Index` for `file`, from the cache next to it (the string
+    tables in `.slice`, and the rows in `.slice.npy`, memory-mapped), or
+    by parsing it and writing that cache.
+
+    A cache is only used if the file's mtime and size are unchanged.
+    `file` must not be compressed.
+    """
+    key = _stat_key(file)
+    path = index_file(file)
+    try:
+        with profiling.phase("index-load", file):
+            with open(path) as f:
+                meta = json.load(f)
+            if meta["version"] == INDEX_VERSION and meta["key"] == key:
+                rows = np.load(path + ".npy", mmap_mode="r")
+                if len(rows) == meta["rows"]:
+                    return Index(file, rows, meta["tables"])
+    except (OSError, ValueError, KeyError):
+        pass
+
+    rows, tables = _build(file)
+    with profiling.phase("index-save", file):
+        _save(file, key, rows, tables)
+    return Index(file, rows, tables)
+
+
+def _indexable(file):
+    if not use_cache or file == "-":
+        return False
+    with open(file, "rb") as f:
+        return inputs.compression(f) is None
+
+
+def _matcher(tags):
+    """
+    `lambda parts: matches(parts, tags)`, but comparing the fields that
+    `tags` fix all at once where the line has them all.
+    """
+    fixed = [(i, t) for i, t in enumerate(tags) if t != "?"]
+    if not fixed:
+        return lambda parts: True
+    positions, values = zip(*fixed)
+    get = operator.itemgetter(*positions)
+    if len(positions) == 1:
+        values = values[0]
+    need = positions[-1] + 1
+
+    def match(parts):
+        if len(parts) >= need:
+            return get(parts) == values
+        return matches(parts, tags)
+
+    return match
+
+
+def _scan(file, queries):
+    """
+    Return the lines of `file` matching each of `queries`, from one pass
+    over its text.
+    """
+    results = [[] for _ in queries]
+    tests = [(_matcher(tags), out) for tags, out in zip(queries, results)]
+    with profiling.phase("parse", file) as p, inputs.open_text(file) as lines:
+        for line in p.count(lines):
+            if line.strip() == "":
+                continue
+            parts = line.split("\t")
+            for match, out in tests:
+                if match(parts):
+                    out.append(parts)
+    return results
+
+
 def iter_all(file, tags):
-    for line in open(file):
-        if line.strip() == "":
-            continue
-        parts = line.split("\t")
+    file = inputs.resolve(file)
+    if _indexable(file):
+        rows = load(file).select([tags])[0]
+    else:
+        rows = _scan(file, [tags])[0]
+    yield from rows
 
-        if all(eq(p, t) for p, t in zip(parts, tags)):
-            yield parts
 
+def select_many(queries, convert=list):
+    """
+    Answer a batch of `(file, tags)` queries, returning the matching
+    rows for each in query order, passed to `convert` as a list.
 
-if __name__ == "__main__":
-    _, file, *tags = sys.argv
+    Queries are grouped by file, and all of a file's are answered from
+    one load of its index (or one pass over its text) before the next
+    file is read.  Nothing of a file is kept but what `convert` returns,
+    so a `convert` that reduces the rows (to a series, say) keeps memory
+    from growing with the number of files.
+    """
+    by_file = {}
+    for n, (file, tags) in enumerate(queries):
+        by_file.setdefault(file, {}).setdefault(tuple(tags), []).append(n)
 
-    print("threads\thandshake per sec per core")
-    for parts in iter_all(file, tags):
+    results = [None] * len(queries)
+    for file, patterns in by_file.items():
+        path = inputs.resolve(file)
+        if _indexable(path):
+            found = load(path).select(list(patterns), convert)
+        else:
+            found = [convert(rows) for rows in _scan(path, list(patterns))]
+        for rows, ns in zip(found, patterns.values()):
+            for n in ns:
+                results[n] = rows
+    return results
+
+
+class Follower:
+    """
+    Follows a result file that is still being written, like `tail -f`.
+
+    Each `poll` parses only the complete lines appended since the last
+    one.  If the file is truncated or replaced, it starts again from the
+    top and says so.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.ident = None
+        self.offset = 0
+        self.partial = b""
+
+    def poll(self):
+        """
+        Returns `(reset, rows)`: the newly-appended rows, and whether
+        any rows returned by earlier calls should be discarded.
+        """
+        try:
+            st = os.stat(self.file)
+        except FileNotFoundError:
+            return False, []
+
+        reset = False
+        ident = (st.st_dev, st.st_ino)
+        if ident != self.ident or st.st_size < self.offset:
+            reset = self.ident is not None
+            self.ident = ident
+            self.offset = 0
+            self.partial = b""
+
+        if st.st_size == self.offset:
+            return reset, []
+
+        with open(self.file, "rb") as f:
+            f.seek(self.offset)
+            data = self.partial + f.read()
+            self.offset = f.tell()
+
+        *lines, self.partial = data.split(b"\n")
+        rows = [
+            (line.decode() + "\n").split("\t") for line in lines if line.strip() != b""
+        ]
+        return reset, rows
+
+
+def follow(queries, interval=1.0):
+    """
+    Follow the files in a batch of `(file, tags)` queries, as for
+    `select_many`.
+
+    Every `interval` seconds this yields `(reset, rows)`, where
+    `rows[n]` are the rows for query `n` appended since the last yield,
+    and `reset[n]` means query `n`'s earlier rows are now stale.  The
+    first yield has everything that is already in the files.
+    """
+    followers = {}
+    for file, _ in queries:
+        followers.setdefault(file, Follower(file))
+
+    while True:
+        polled = {file: f.poll() for file, f in followers.items()}
+        reset = [polled[file][0] for file, _ in queries]
+        rows = [
+            [parts for parts in polled[file][1] if matches(parts, tags)]
+            for file, tags in queries
+        ]
+        yield reset, rows
+        time.sleep(interval)
+
+
+class Throttle:
+    """
+    Says whether something may happen now, at most once every `period`
+    seconds.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.last = None
+
+    def ready(self):
+        now = time.monotonic()
+        if self.last is not None and now - self.last < self.period:
+            return False
+        self.last = now
+        return True
+
+
+def print_rows(rows):
+    for parts in rows:
         print(
             "%s\t%s"
             % (
                 extract_which("threads", parts, "1"),
                 extract_which("per-thread", parts, parts[-2]),
-            )
+            ),
+            flush=True,
         )
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Scan the file's text, without reading or writing its index.",
+    )
+    ap.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep following the file as it grows, printing new rows as they appear.",
+    )
+    profiling.add_arguments(ap)
+    ap.add_argument("file")
+    ap.add_argument("tags", nargs="*")
+    opts = ap.parse_args()
+    profiling.start(opts)
+    use_cache = not opts.no_cache
+
+    print("threads\thandshake per sec per core")
+    if opts.watch:
+        for reset, (rows,) in follow([(opts.file, opts.tags)]):
+            if reset[0]:
+                print("-- %s was truncated or replaced" % opts.file, flush=True)
+            print_rows(rows)
+    else:
+        print_rows(iter_all(opts.file, opts.tags))
@@ -0,0 +1,237 @@
+"""
+Generates synthetic inputs for the scripts in this directory, laid out
+as they expect to find them, for measuring how fast they run.
+"""
+
+import argparse
+import json
+import os
+import random
+
+import numpy as np
+
+RUSTLS_FILES = ("result-thr-23.16-2.txt", "result-thr-23.17.txt")
+OPENSSL_FILES = (
+    "openssl-thread05-arm.out.txt",
+    "openssl-host-thread02-arm.out.txt",
+    "boringssl-thr-02.out.txt",
+)
+LATENCY_IMPLS = ("rustls", "openssl-3.0.14", "openssl-3.4.0", "boringssl")
+LATENCY_KINDS = ("resume-tls13", "resume-tls12", "fullhs-tls13", "fullhs-tls12")
+CRITERION_BENCHES = ("X25519", "X25519MLKEM768", "X25519MLKEM768+X25519")
+
+RUSTLS_HANDSHAKES = [
+    (version, key, suite, side, resume)
+    for version, key, suite in (
+        ("TLSv1_2", "Rsa2048", "TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384"),
+        ("TLSv1_2", "EcdsaP256", "TLS_ECDHE_ECDSA_WITH_AES_256_GCM_SHA384"),
+        ("TLSv1_3", "Rsa2048", "TLS13_AES_256_GCM_SHA384"),
+        ("TLSv1_3", "EcdsaP256", "TLS13_AES_256_GCM_SHA384"),
+    )
+    for side in ("client", "server")
+    for resume in ("no-resume", "sessionid", "tickets")
+]
+RUSTLS_BULK = [
+    (kind, version, suite, direction)
+    for kind in ("bulk", "bulk-unbuffered")
+    for version, suite in (
+        ("TLSv1_2", "TLS_ECDHE_RSA_WITH_AES_128_GCM_SHA256"),
+        ("TLSv1_3", "TLS13_AES_256_GCM_SHA384"),
+    )
+    for direction in ("send", "recv")
+]
+OPENSSL_HANDSHAKES = [
+    (kind, side, key, suite)
+    for kind in ("handshakes", "handshake-ticket", "handshake-resume")
+    for side in ("client", "server")
+    for key, suite in (
+        ("rsa", "ECDHE-RSA-AES256-GCM-SHA384"),
+        ("rsa", "TLS_AES_256_GCM_SHA384"),
+    )
+]
+
+
+def usl(n, sigma=0.02, kappa=0.0001):
+    return 1 / (1 + sigma * (n - 1) + kappa * n * (n - 1))
+
+
+def write_lines(fn, lines, count):
+    """
+    Write the first `count` items of the endless iterator `lines` to `fn`.
+    """
+    with open(fn, "w") as f:
+        batch = []
+        for _, line in zip(range(count), lines):
+            batch.append(line)
+            if len(batch) == 100_000:
+                f.writelines(batch)
+                batch = []
+        f.writelines(batch)
+
+
+def rustls_lines(rng, max_threads):
+    """
+    Rows like rustls' bench output, as repeated thread sweeps.
+    """
+    while True:
+        for threads in range(1, max_threads + 1):
+            scale = usl(threads)
+            for version, key, suite, side, resume in RUSTLS_HANDSHAKES:
+                per_thread = 10000 * scale * rng.uniform(0.97, 1.03)
+                yield "\t".join(
+                    [
+                        "handshakes",
+                        version,
+                        key,
+                        suite,
+                        side,
+                        "server-auth",
+                        resume,
+                        "%.2f" % (per_thread * threads),
+                        "threads",
+                        str(threads),
+                        "per-thread",
+                        "%.2f" % per_thread,
+                        "handshakes/s\n",
+                    ]
+                )
+            for kind, version, suite, direction in RUSTLS_BULK:
+                yield "\t".join(
+                    [
+                        kind,
+                        version,
+                        suite,
+                        "Rsa2048",
+                        direction,
+                        "%.2f" % (5000 * scale * rng.uniform(0.97, 1.03)),
+                        "MB/s\n",
+                    ]
+                )
+
+
+def openssl_lines(rng, max_threads):
+    while True:
+        for threads in range(1, max_threads + 1):
+            scale = usl(threads, 0.03, 0.0002)
+            for kind, side, key, suite in OPENSSL_HANDSHAKES:
+                per_thread = 8000 * scale * rng.uniform(0.97, 1.03)
+                yield "\t".join(
+                    [
+                        kind,
+                        side,
+                        key,
+                        suite,
+                        "threads",
+                        str(threads),
+                        "per-thread",
+                        "%.2f" % per_thread,
+                        "%.2f" % (per_thread * threads),
+                        "handshakes/s\n",
+                    ]
+                )
+
+
+OPENSSL_SECTIONS = [
+    ("bulk ECDHE-RSA-AES128-GCM-SHA256", ("send", "recv")),
+    ("bulk TLS_AES_256_GCM_SHA384", ("send", "recv")),
+    ("handshake ECDHE-RSA-AES256-GCM-SHA384", ("client", "server")),
+    ("handshake ECDHE-ECDSA-AES256-GCM-SHA384", ("client", "server")),
+    ("handshake TLS_AES_256_GCM_SHA384", ("client", "server")),
+    ("--ecdsa handshake TLS_AES_256_GCM_SHA384", ("client", "server")),
+    ("handshake-resume ECDHE-RSA-AES256-GCM-SHA384", ("client", "server")),
+    ("handshake-ticket TLS_AES_256_GCM_SHA384", ("client", "server")),
+]
+
+
+def openssl_log_lines(rng):
+    """
+    A log like the OpenSSL bench harness prints, for extract-osl.py.
+    """
+    while True:
+        for introducer, (first, second) in OPENSSL_SECTIONS:
+            yield "+ ./bench %s\n" % introducer
+            for _ in range(20):
+                yield "warming up... %d iterations\n" % rng.randint(1, 1000)
+            for which in (first, second):
+                if introducer.startswith("bulk"):
+                    yield "%s\t%.2f\tMB/s\n" % (which, rng.uniform(1000, 5000))
+                else:
+                    yield "handshakes\t%s\t%.2f\thandshakes/s\n" % (
+                        which,
+                        rng.uniform(1000, 5000),
+                    )
+
+
+def write_latency(fn, gen, samples, chunk=1_000_000):
+    with open(fn, "w") as f:
+        for start in range(0, samples, chunk):
+            n = min(chunk, samples - start)
+            values = gen.lognormal(np.log(60), 0.4, n)
+            f.write(
+                "".join(
+                    "%d\t%.3f\n" % (i, v)
+                    for i, v in zip(range(start, start + n), values)
+                )
+            )
+
+
+def write_criterion(fn, gen, iters, micros):
+    """
+    A criterion `sample.json` with 100 linearly-sampled measurements,
+    totalling about `iters` iterations.
+    """
+    step = max(1, iters // 5050)
+    counts = [float(step * i) for i in range(1, 101)]
+    times = [c * micros * 1e3 * gen.normal(1, 0.03) for c in counts]
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    with open(fn, "w") as f:
+        json.dump(dict(sampling_mode="Linear", iters=counts, times=times), f)
+
+
+def generate(out, lines, samples, iters, max_threads=96, seed=0):
+    rng = random.Random(seed)
+    gen = np.random.default_rng(seed)
+    os.makedirs(out, exist_ok=True)
+
+    for fn in RUSTLS_FILES + ("result.txt",):
+        write_lines(os.path.join(out, fn), rustls_lines(rng, max_threads), lines)
+    for fn in OPENSSL_FILES:
+        write_lines(os.path.join(out, fn), openssl_lines(rng, max_threads), lines)
+    write_lines(os.path.join(out, "openssl.txt"), openssl_log_lines(rng), lines)
+
+    for impl in LATENCY_IMPLS:
+        os.makedirs(os.path.join(out, impl), exist_ok=True)
+        for kind in LATENCY_KINDS:
+            fn = os.path.join(out, impl, "latency-%s-server.tsv" % kind)
+            write_latency(fn, gen, samples)
+
+    for arch in ("amd64", "arm64"):
+        for bench, micros in zip(CRITERION_BENCHES, (30, 45, 70)):
+            fn = os.path.join(out, arch, "clienthello", bench, "new", "sample.json")
+            write_criterion(fn, gen, iters, micros)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument(
+        "--scale",
+        type=int,
+        default=100_000,
+        help="Default for --lines, --samples and --iters.",
+    )
+    ap.add_argument("--lines", type=int, help="Lines per result file.")
+    ap.add_argument("--samples", type=int, help="Samples per latency TSV.")
+    ap.add_argument("--iters", type=int, help="Iterations per criterion benchmark.")
+    ap.add_argument("--threads", type=int, default=96)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("out", help="Directory to write into.")
+    opts = ap.parse_args()
+
+    generate(
+        opts.out,
+        lines=opts.lines or opts.scale,
+        samples=opts.samples or opts.scale,
+        iters=opts.iters or opts.scale,
+        max_threads=opts.threads,
+        seed=opts.seed,
+    )
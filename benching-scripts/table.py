@@ -1,47 +1,107 @@
-import sys
+import argparse
+import statistics
 
-_, file, *colspec = sys.argv
+import profiling
+import slice
 
 
-def extract_which(name, parts, default=None):
-    try:
-        idx = parts.index(name)
-        assert idx is not None
-        return parts[idx + 1]
-    except:
-        return default
+def by_threads(rows, out=None):
+    """
+    Group the measurements in `rows` by thread count, adding to `out`
+    if given.
+    """
+    if out is None:
+        out = {}
+    for parts in rows:
+        threads = slice.extract_which("threads", parts, "1")
+        measure = slice.extract_which("per-thread", parts, parts[-2])
+        out.setdefault(threads, []).append(measure)
+    return out
 
 
-def eq(v, p):
-    if p == v:
-        return True
-    if p == "?":
-        return True
+def summarise(measures):
+    if len(measures) == 1:
+        return measures[0]
+    return "%g" % statistics.median(float(m) for m in measures)
 
 
-columns = []
+def join(columns, missing="0"):
+    """
+    Outer-join `columns` (each a dict from `by_threads`) on thread
+    count, in ascending order.
 
-for col in colspec:
-    head, tags = col.split("=")
-    tags = tags.split()
-    columns.append([head, tags, []])
+    Thread counts with several measurements report their median.
+    """
+    threads = sorted(set().union(*columns), key=float)
+    return [
+        [t] + [summarise(col[t]) if t in col else missing for col in columns]
+        for t in threads
+    ]
 
-for line in open(file):
-    if line.strip() == "":
-        continue
-    parts = line.split("\t")
 
-    for head, tags, out in columns:
-        if all(eq(p, t) for p, t in zip(parts, tags)):
-            threads = extract_which("threads", parts, "1")
-            measure = extract_which("per-thread", parts, parts[-2])
-            out.append(threads)
-            out.append(measure)
+def parse_colspec(colspec):
+    heads, queries = [], []
+    for col in colspec:
+        head, tags = col.split("=")
+        heads.append(head)
+        queries.append(tags.split())
+    return heads, queries
 
-print("threads\t" + ("\t".join(col[0] for col in columns)))
-for threads in columns[0][2][::2]:
-    print(
-        threads
-        + "\t"
-        + "\t".join(extract_which(threads, col[2], "0") for col in columns)
+
+def print_table(heads, columns):
+    print("threads\t" + ("\t".join(heads)))
+    for row in join(columns):
+        print("\t".join(row))
+
+
+def watch(file, heads, queries, refresh):
+    """
+    Follow `file` as it grows, reprinting the table at most every
+    `refresh` seconds when it has changed.
+    """
+    columns = [{} for _ in queries]
+    throttle = slice.Throttle(refresh)
+    changed = False
+
+    for reset, rows in slice.follow([(file, tags) for tags in queries]):
+        for col, r, new in zip(columns, reset, rows):
+            if r:
+                col.clear()
+                changed = True
+            if new:
+                by_threads(new, col)
+                changed = True
+        if changed and throttle.ready():
+            print_table(heads, columns)
+            print(flush=True)
+            changed = False
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep following the file as it grows, reprinting the table when it changes.",
     )
+    ap.add_argument(
+        "--refresh",
+        type=float,
+        default=10,
+        help="In --watch mode, reprint the table at most this often (in seconds).",
+    )
+    ap.add_argument("file")
+    ap.add_argument("colspec", nargs="+", help="Columns, as 'heading=tag tag ...'")
+    profiling.add_arguments(ap)
+    opts = ap.parse_args()
+    profiling.start(opts)
+
+    heads, queries = parse_colspec(opts.colspec)
+    if opts.watch:
+        watch(opts.file, heads, queries, opts.refresh)
+    else:
+        with profiling.phase("select", opts.file):
+            selected = slice.select_many([(opts.file, tags) for tags in queries])
+        with profiling.phase("summarise"):
+            columns = [by_threads(rows) for rows in selected]
+            print_table(heads, columns)
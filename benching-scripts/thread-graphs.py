@@ -1,20 +1,47 @@
+import argparse
+
 import matplotlib.pyplot as plt
 import numpy as np
 
+import profiling
+import rebuild
 import slice
+import usl
 
 plt.rcParams["svg.fonttype"] = "none"
 plt.rcParams["font.sans-serif"] = ["Arial", "DejaVu Sans"]
 plt.rcParams["font.size"] = 8
 
 
-def read(fn, *tags):
-    x = []
-    y = []
-    for line in slice.iter_all(fn, tags):
-        x.append(int(slice.extract_which("threads", line)))
-        y.append(float(slice.extract_which("per-thread", line, line[-2])))
-    return x, y
+# Set by --usl-overlay
+usl_overlay = False
+
+
+def plot(x, y, **kwargs):
+    """
+    `plt.plot`, plus the fitted USL curve if `usl_overlay` is set.
+    """
+    lines = plt.plot(x, y, **kwargs)
+    if usl_overlay:
+        usl.overlay(plt.gca(), x, y, color=lines[0].get_color())
+    return lines
+
+
+def read_all(queries):
+    """
+    Read every series in `queries` (a dict of name -> (file, *tags)),
+    taking one pass per distinct file.
+    """
+
+    def series(rows):
+        with profiling.phase("series"):
+            return usl.xy(rows)
+
+    with profiling.phase("select"):
+        found = slice.select_many(
+            [(fn, tags) for fn, *tags in queries.values()], series
+        )
+    return dict(zip(queries, found))
 
 
 openssl_3_4_file = "openssl-thread05-arm.out.txt"
@@ -27,283 +54,332 @@ rustls_fix_file = "result-thr-23.17.txt"
 rustls_fix_version = "rustls 0.23.17"
 boringssl_file = "boringssl-thr-02.out.txt"
 
-plt.subplots(figsize=(9, 6), dpi=200)
-lines = []
-
-for (x, y), label in [
-    (
-        read(
-            rustls_file,
-            "handshakes",
-            "?",
-            "?",
-            "TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384",
-            "server",
-            "server-auth",
-            "tickets",
-        ),
-        rustls_version + " (tickets)",
-    ),
-    (
-        read(
-            rustls_file,
-            "handshakes",
-            "?",
-            "?",
-            "TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384",
-            "server",
-            "server-auth",
-            "sessionid",
-        ),
-        rustls_version + " (session-id)",
-    ),
-    (
-        read(
-            openssl_3_0_file,
-            "handshake-ticket",
-            "server",
-            "?",
-            "ECDHE-RSA-AES256-GCM-SHA384",
-        ),
-        openssl_3_0_version + " (tickets)",
-    ),
-    (
-        read(
-            openssl_3_0_file,
-            "handshake-resume",
-            "server",
-            "?",
-            "ECDHE-RSA-AES256-GCM-SHA384",
-        ),
-        openssl_3_0_version + " (session-id)",
-    ),
-    (
-        read(
-            openssl_3_4_file,
-            "handshake-ticket",
-            "server",
-            "?",
-            "ECDHE-RSA-AES256-GCM-SHA384",
-        ),
-        openssl_3_4_version + " (tickets)",
-    ),
-    (
-        read(
-            openssl_3_4_file,
-            "handshake-resume",
-            "server",
-            "?",
-            "ECDHE-RSA-AES256-GCM-SHA384",
-        ),
-        openssl_3_4_version + " (session-id)",
-    ),
-    (
-        read(
-            boringssl_file,
-            "handshake-ticket",
-            "server",
-            "?",
-            "ECDHE-RSA-AES256-GCM-SHA384",
-        ),
-        "BoringSSL (tickets)",
-    ),
-    (
-        read(
-            boringssl_file,
-            "handshake-resume",
-            "server",
-            "?",
-            "ECDHE-RSA-AES256-GCM-SHA384",
-        ),
-        "BoringSSL (session-id)",
-    ),
-]:
-    lines.append(plt.plot(x, y, marker="o", linewidth=1, markersize=1, label=label))
-
-plt.axvline(x=80, linestyle="dotted", linewidth=0.5)
-plt.ylabel("handshakes per second per thread")
-plt.xlabel("Threads")
-legend = plt.legend(
-    loc="upper center", fancybox=True, ncol=4, bbox_to_anchor=(0.5, 1.1)
-)
-plt.suptitle("TLS1.2 resumed server handshake scalability vs thread count")
-plt.grid(visible=True, linewidth=0.1)
-plt.gca().set_xlim(xmin=0)
-plt.gca().set_ylim(ymin=0)
-plt.savefig("resumed-12-server.svg", format="svg")
-
-x, y = read(
-    rustls_fix_file,
-    "handshakes",
+TLS12_RESUMPTION = ("?", "ECDHE-RSA-AES256-GCM-SHA384")
+TLS13 = ("?", "TLS_AES_256_GCM_SHA384")
+RUSTLS_TLS12 = (
     "?",
     "?",
     "TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384",
     "server",
     "server-auth",
-    "tickets",
-)
-label = rustls_fix_version + " (tickets)"
-
-lines[0][0].set_linestyle("dotted")
-legend.get_texts()[0].set_text(label)
-plt.plot(
-    x,
-    y,
-    marker="o",
-    linewidth=1,
-    markersize=1,
-    label=label,
-    color=lines[0][0].get_color(),
 )
-plt.savefig("resumed-12-server-postfix.svg", format="svg")
-
-plt.close()
-plt.subplots(figsize=(9, 6), dpi=200)
-
-lines = []
+RUSTLS_TLS13 = ("?", "Rsa2048", "TLS13_AES_256_GCM_SHA384", "server", "server-auth")
 
-for (x, y), label in [
-    (
-        read(
-            rustls_file,
-            "handshakes",
-            "?",
-            "Rsa2048",
-            "TLS13_AES_256_GCM_SHA384",
-            "server",
-            "server-auth",
-            "tickets",
-        ),
-        rustls_version,
+SERIES = {
+    "rustls-12-tickets": (rustls_file, "handshakes", *RUSTLS_TLS12, "tickets"),
+    "rustls-12-sessionid": (rustls_file, "handshakes", *RUSTLS_TLS12, "sessionid"),
+    "rustls-fix-12-tickets": (
+        rustls_fix_file,
+        "handshakes",
+        *RUSTLS_TLS12,
+        "tickets",
     ),
-    (
-        read(
-            rustls_fix_file,
-            "handshakes",
-            "?",
-            "Rsa2048",
-            "TLS13_AES_256_GCM_SHA384",
-            "server",
-            "server-auth",
-            "tickets",
-        ),
-        rustls_fix_version,
+    "openssl-3.0-12-tickets": (
+        openssl_3_0_file,
+        "handshake-ticket",
+        "server",
+        *TLS12_RESUMPTION,
     ),
-    (
-        read(
-            openssl_3_0_file,
-            "handshake-ticket",
-            "server",
-            "?",
-            "TLS_AES_256_GCM_SHA384",
-        ),
-        openssl_3_0_version,
+    "openssl-3.0-12-sessionid": (
+        openssl_3_0_file,
+        "handshake-resume",
+        "server",
+        *TLS12_RESUMPTION,
     ),
-    (
-        read(
-            openssl_3_4_file,
-            "handshake-ticket",
-            "server",
-            "?",
-            "TLS_AES_256_GCM_SHA384",
-        ),
-        openssl_3_4_version,
+    "openssl-3.4-12-tickets": (
+        openssl_3_4_file,
+        "handshake-ticket",
+        "server",
+        *TLS12_RESUMPTION,
     ),
-    (
-        read(
-            boringssl_file,
-            "handshake-ticket",
-            "server",
-            "?",
-            "TLS_AES_256_GCM_SHA384",
-        ),
-        "BoringSSL",
+    "openssl-3.4-12-sessionid": (
+        openssl_3_4_file,
+        "handshake-resume",
+        "server",
+        *TLS12_RESUMPTION,
+    ),
+    "boringssl-12-tickets": (
+        boringssl_file,
+        "handshake-ticket",
+        "server",
+        *TLS12_RESUMPTION,
+    ),
+    "boringssl-12-sessionid": (
+        boringssl_file,
+        "handshake-resume",
+        "server",
+        *TLS12_RESUMPTION,
+    ),
+    "rustls-13-tickets": (rustls_file, "handshakes", *RUSTLS_TLS13, "tickets"),
+    "rustls-fix-13-tickets": (
+        rustls_fix_file,
+        "handshakes",
+        *RUSTLS_TLS13,
+        "tickets",
+    ),
+    "openssl-3.0-13-tickets": (
+        openssl_3_0_file,
+        "handshake-ticket",
+        "server",
+        *TLS13,
     ),
-]:
-    extra = dict()
-    if label == rustls_version:
-        extra = dict(linestyle="dotted")
-    if label == rustls_fix_version:
-        extra = dict(color=lines[0][0].get_color())
-
-    lines.append(
-        plt.plot(x, y, marker="o", linewidth=1, markersize=1, label=label, **extra)
+    "openssl-3.4-13-tickets": (
+        openssl_3_4_file,
+        "handshake-ticket",
+        "server",
+        *TLS13,
+    ),
+    "boringssl-13-tickets": (boringssl_file, "handshake-ticket", "server", *TLS13),
+    "rustls-13-full": (rustls_file, "handshakes", *RUSTLS_TLS13, "no-resume"),
+    "openssl-3.0-13-full": (openssl_3_0_file, "handshakes", "server", *TLS13),
+    "openssl-3.4-13-full": (openssl_3_4_file, "handshakes", "server", *TLS13),
+    "boringssl-13-full": (boringssl_file, "handshakes", "server", *TLS13),
+}
+
+
+def resumed_12_server(series):
+    plt.subplots(figsize=(9, 6), dpi=200)
+    lines = []
+
+    for (x, y), label in [
+        (series["rustls-12-tickets"], rustls_version + " (tickets)"),
+        (series["rustls-12-sessionid"], rustls_version + " (session-id)"),
+        (series["openssl-3.0-12-tickets"], openssl_3_0_version + " (tickets)"),
+        (series["openssl-3.0-12-sessionid"], openssl_3_0_version + " (session-id)"),
+        (series["openssl-3.4-12-tickets"], openssl_3_4_version + " (tickets)"),
+        (series["openssl-3.4-12-sessionid"], openssl_3_4_version + " (session-id)"),
+        (series["boringssl-12-tickets"], "BoringSSL (tickets)"),
+        (series["boringssl-12-sessionid"], "BoringSSL (session-id)"),
+    ]:
+        lines.append(plot(x, y, marker="o", linewidth=1, markersize=1, label=label))
+
+    plt.axvline(x=80, linestyle="dotted", linewidth=0.5)
+    plt.ylabel("handshakes per second per thread")
+    plt.xlabel("Threads")
+    legend = plt.legend(
+        loc="upper center", fancybox=True, ncol=4, bbox_to_anchor=(0.5, 1.1)
     )
+    plt.suptitle("TLS1.2 resumed server handshake scalability vs thread count")
+    plt.grid(visible=True, linewidth=0.1)
+    plt.gca().set_xlim(xmin=0)
+    plt.gca().set_ylim(ymin=0)
+    profiling.savefig("resumed-12-server.svg", format="svg")
 
+    x, y = series["rustls-fix-12-tickets"]
+    label = rustls_fix_version + " (tickets)"
 
-plt.axvline(x=80, linestyle="dotted", linewidth=0.5)
-plt.ylabel("handshakes per second per thread")
-plt.xlabel("Threads")
-legend = plt.legend(
-    loc="upper center", fancybox=True, ncol=4, bbox_to_anchor=(0.5, 1.1)
-)
-plt.suptitle("TLS1.3 resumed server handshake scalability vs thread count")
-plt.grid(visible=True, linewidth=0.1)
-plt.gca().set_xlim(xmin=0)
-plt.gca().set_ylim(ymin=0)
-plt.savefig("resumed-13-server.svg", format="svg")
+    lines[0][0].set_linestyle("dotted")
+    legend.get_texts()[0].set_text(label)
+    plot(
+        x,
+        y,
+        marker="o",
+        linewidth=1,
+        markersize=1,
+        label=label,
+        color=lines[0][0].get_color(),
+    )
+    profiling.savefig("resumed-12-server-postfix.svg", format="svg")
+    plt.close()
 
-lines[0][0].set_linestyle("dotted")
-plt.savefig("resumed-13-server-postfix.svg", format="svg")
 
+def resumed_13_server(series):
+    plt.subplots(figsize=(9, 6), dpi=200)
 
-plt.close()
-plt.subplots(figsize=(9, 6), dpi=200)
+    lines = []
 
-for (x, y), label in [
-    (
-        read(
-            rustls_file,
-            "handshakes",
-            "?",
-            "Rsa2048",
-            "TLS13_AES_256_GCM_SHA384",
-            "server",
-            "server-auth",
-            "no-resume",
-        ),
-        rustls_version,
-    ),
+    for (x, y), label in [
+        (series["rustls-13-tickets"], rustls_version),
+        (series["rustls-fix-13-tickets"], rustls_fix_version),
+        (series["openssl-3.0-13-tickets"], openssl_3_0_version),
+        (series["openssl-3.4-13-tickets"], openssl_3_4_version),
+        (series["boringssl-13-tickets"], "BoringSSL"),
+    ]:
+        extra = dict()
+        if label == rustls_version:
+            extra = dict(linestyle="dotted")
+        if label == rustls_fix_version:
+            extra = dict(color=lines[0][0].get_color())
+
+        lines.append(
+            plot(x, y, marker="o", linewidth=1, markersize=1, label=label, **extra)
+        )
+
+    plt.axvline(x=80, linestyle="dotted", linewidth=0.5)
+    plt.ylabel("handshakes per second per thread")
+    plt.xlabel("Threads")
+    legend = plt.legend(
+        loc="upper center", fancybox=True, ncol=4, bbox_to_anchor=(0.5, 1.1)
+    )
+    plt.suptitle("TLS1.3 resumed server handshake scalability vs thread count")
+    plt.grid(visible=True, linewidth=0.1)
+    plt.gca().set_xlim(xmin=0)
+    plt.gca().set_ylim(ymin=0)
+    profiling.savefig("resumed-13-server.svg", format="svg")
+
+    lines[0][0].set_linestyle("dotted")
+    profiling.savefig("resumed-13-server-postfix.svg", format="svg")
+    plt.close()
+
+
+def full_server(series):
+    plt.subplots(figsize=(9, 6), dpi=200)
+
+    for (x, y), label in [
+        (series["rustls-13-full"], rustls_version),
+        (series["openssl-3.0-13-full"], openssl_3_0_version),
+        (series["openssl-3.4-13-full"], openssl_3_4_version),
+        (series["boringssl-13-full"], "BoringSSL"),
+    ]:
+        plot(x, y, marker="o", linewidth=1, markersize=1, label=label)
+
+    plt.axvline(x=80, linestyle="dotted", linewidth=0.5)
+    plt.ylabel("handshakes per second per thread")
+    plt.xlabel("Threads")
+    plt.legend(loc="upper center", fancybox=True, ncol=4, bbox_to_anchor=(0.5, 1.1))
+    plt.suptitle("TLS1.3 full server handshake scalability vs thread count")
+    plt.grid(visible=True, linewidth=0.1)
+    plt.gca().set_xlim(xmin=0)
+    plt.gca().set_ylim(ymin=0)
+    profiling.savefig("full-server.svg", format="svg")
+    plt.close()
+
+
+# Each figure-drawing function, with the files it writes and the series
+# it uses.
+FIGURES = [
     (
-        read(
-            openssl_3_0_file,
-            "handshakes",
-            "server",
-            "?",
-            "TLS_AES_256_GCM_SHA384",
-        ),
-        openssl_3_0_version,
+        resumed_12_server,
+        ["resumed-12-server.svg", "resumed-12-server-postfix.svg"],
+        [
+            "rustls-12-tickets",
+            "rustls-12-sessionid",
+            "rustls-fix-12-tickets",
+            "openssl-3.0-12-tickets",
+            "openssl-3.0-12-sessionid",
+            "openssl-3.4-12-tickets",
+            "openssl-3.4-12-sessionid",
+            "boringssl-12-tickets",
+            "boringssl-12-sessionid",
+        ],
     ),
     (
-        read(
-            openssl_3_4_file,
-            "handshakes",
-            "server",
-            "?",
-            "TLS_AES_256_GCM_SHA384",
-        ),
-        openssl_3_4_version,
+        resumed_13_server,
+        ["resumed-13-server.svg", "resumed-13-server-postfix.svg"],
+        [
+            "rustls-13-tickets",
+            "rustls-fix-13-tickets",
+            "openssl-3.0-13-tickets",
+            "openssl-3.4-13-tickets",
+            "boringssl-13-tickets",
+        ],
     ),
     (
-        read(
-            boringssl_file,
-            "handshakes",
-            "server",
-            "?",
-            "TLS_AES_256_GCM_SHA384",
-        ),
-        "BoringSSL",
+        full_server,
+        ["full-server.svg"],
+        [
+            "rustls-13-full",
+            "openssl-3.0-13-full",
+            "openssl-3.4-13-full",
+            "boringssl-13-full",
+        ],
     ),
-]:
-    plt.plot(x, y, marker="o", linewidth=1, markersize=1, label=label)
-
-
-plt.axvline(x=80, linestyle="dotted", linewidth=0.5)
-plt.ylabel("handshakes per second per thread")
-plt.xlabel("Threads")
-plt.legend(loc="upper center", fancybox=True, ncol=4, bbox_to_anchor=(0.5, 1.1))
-plt.suptitle("TLS1.3 full server handshake scalability vs thread count")
-plt.grid(visible=True, linewidth=0.1)
-plt.gca().set_xlim(xmin=0)
-plt.gca().set_ylim(ymin=0)
-plt.savefig("full-server.svg", format="svg")
+]
+
+
+def build(force=False, report=False):
+    """
+    Redraw the figures whose inputs or definitions have changed since
+    they were last drawn.  With `report`, also print USL fits for every
+    series.
+    """
+    b = rebuild.Build(force=force)
+
+    todo = []
+    for draw, outputs, uses in FIGURES:
+        inputs = [SERIES[u][0] for u in uses]
+        spec = rebuild.definition(draw) + repr(([SERIES[u] for u in uses], usl_overlay))
+        if b.stale(draw.__name__, outputs, inputs, spec):
+            todo.append((draw, uses, inputs, spec))
+
+    needed = set(SERIES) if report else set(u for t in todo for u in t[1])
+    series = b.series({k: v for k, v in SERIES.items() if k in needed}, read_all)
+    if report:
+        with profiling.phase("usl"):
+            usl.report(np.random.default_rng(0), series)
+
+    for draw, _, inputs, spec in todo:
+        with profiling.phase("draw", draw.__name__):
+            draw(series)
+        b.drawn(draw.__name__, inputs, spec)
+        print("drew", draw.__name__)
+    b.save()
+
+
+def watch(refresh):
+    """
+    Follow every input file as it grows, redrawing the figures whose
+    series have changed at most every `refresh` seconds.
+    """
+    names = list(SERIES)
+    series = {name: ([], []) for name in names}
+    changed = set()
+    throttle = slice.Throttle(refresh)
+
+    for reset, rows in slice.follow([(fn, tags) for fn, *tags in SERIES.values()]):
+        for name, r, new in zip(names, reset, rows):
+            x, y = series[name]
+            if r:
+                del x[:], y[:]
+                changed.add(name)
+            if new:
+                new_x, new_y = usl.xy(new)
+                x.extend(new_x)
+                y.extend(new_y)
+                changed.add(name)
+
+        if changed and throttle.ready():
+            for draw, _, uses in FIGURES:
+                if changed.intersection(uses):
+                    draw(series)
+                    print("redrew", draw.__name__, flush=True)
+            changed.clear()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep following the input files as they grow, redrawing figures as their series change.",
+    )
+    ap.add_argument(
+        "--refresh",
+        type=float,
+        default=30,
+        help="In --watch mode, redraw figures at most this often (in seconds).",
+    )
+    ap.add_argument(
+        "--usl",
+        action="store_true",
+        help="Print a Universal Scalability Law fit for every series.",
+    )
+    ap.add_argument(
+        "--usl-overlay",
+        action="store_true",
+        help="Draw the fitted USL curve behind each plotted series.",
+    )
+    ap.add_argument(
+        "--force",
+        action="store_true",
+        help="Redraw every figure, even those whose inputs and definition are unchanged.",
+    )
+    profiling.add_arguments(ap)
+    opts = ap.parse_args()
+    profiling.start(opts)
+    usl_overlay = opts.usl_overlay
+
+    if opts.watch:
+        watch(opts.refresh)
+    else:
+        build(opts.force, opts.usl)
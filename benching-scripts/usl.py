@@ -0,0 +1,157 @@
+"""
+Fits Gunther's Universal Scalability Law to thread sweeps.
+
+For N threads, the USL predicts total throughput
+
+    X(N) = λN / (1 + σ(N - 1) + κN(N - 1))
+
+where σ measures contention (serialisation) and κ coherency (crosstalk)
+costs.  Our results are per-thread throughput, X(N) / N, whose
+reciprocal is linear in (1, N - 1, N(N - 1)); so the fit is a weighted
+linear least squares, and is cheap enough to bootstrap.
+"""
+
+import argparse
+
+import numpy as np
+
+import slice
+
+PARAMS = ("lambda", "sigma", "kappa", "peak")
+
+
+def xy(rows):
+    """
+    Thread counts and per-thread throughputs of `rows`, as selected by
+    slice.py.  Rows without a thread count are for one thread.
+    """
+    x = []
+    y = []
+    for parts in rows:
+        x.append(int(slice.extract_which("threads", parts, "1")))
+        y.append(float(slice.extract_which("per-thread", parts, parts[-2])))
+    return x, y
+
+
+def _design(x, y):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    a = np.stack([np.ones_like(x), x - 1, x * (x - 1)], axis=-1)
+    # Weighting each row by y^2 makes the residuals approximately those
+    # of y itself, rather than of 1/y.
+    w = (y**2)[..., np.newaxis]
+    return a * w, (1 / y) * w[..., 0]
+
+
+def _params(coef):
+    a, b, c = np.moveaxis(coef, -1, 0)
+    sigma = b / a
+    kappa = c / a
+    with np.errstate(divide="ignore", invalid="ignore"):
+        peak = np.where((kappa > 0) & (sigma < 1), np.sqrt((1 - sigma) / kappa), np.inf)
+    return dict(zip(PARAMS, (1 / a, sigma, kappa, peak)))
+
+
+def fit(x, y):
+    """
+    Fit the USL to per-thread throughput `y` at thread counts `x`.
+
+    Returns a dict of `lambda`, `sigma`, `kappa` and `peak` (the thread
+    count at which total throughput is greatest), or None if there are
+    fewer than three distinct thread counts.
+    """
+    if len(set(x)) < 3:
+        return None
+    a, b = _design(x, y)
+    coef, *_ = np.linalg.lstsq(a, b, rcond=None)
+    return {k: float(v) for k, v in _params(coef).items()}
+
+
+def bootstrap(rng, x, y, resamples=2000, confidence=0.95):
+    """
+    Return a dict of (low, high) `confidence` intervals for each of the
+    parameters from `fit`, by resampling (thread count, throughput)
+    pairs.
+    """
+    a, b = _design(x, y)
+    picks = rng.integers(0, len(b), size=(resamples, len(b)))
+    a, b = a[picks], b[picks]
+    ata = np.einsum("rni,rnj->rij", a, a)
+    atb = np.einsum("rni,rn->ri", a, b)
+    coef = np.einsum("rij,rj->ri", np.linalg.pinv(ata), atb)
+
+    tails = [(1 - confidence) / 2 * 100, (1 + confidence) / 2 * 100]
+    # "nearest" so that an unbounded peak gives inf, not inf - inf
+    return {
+        k: tuple(np.percentile(v, tails, method="nearest"))
+        for k, v in _params(coef).items()
+    }
+
+
+def per_thread(params, n):
+    """
+    The fitted per-thread throughput at thread counts `n`.
+    """
+    n = np.asarray(n, dtype=np.float64)
+    return params["lambda"] / (
+        1 + params["sigma"] * (n - 1) + params["kappa"] * n * (n - 1)
+    )
+
+
+def overlay(ax, x, y, **kwargs):
+    """
+    Draw the USL curve fitted to `x`, `y` onto `ax`.
+    """
+    params = fit(x, y)
+    if params is None:
+        return
+    n = np.linspace(1, max(x), 200)
+    ax.plot(n, per_thread(params, n), linestyle="dashed", linewidth=0.5, **kwargs)
+
+
+def report(rng, series, resamples=2000, confidence=0.95):
+    """
+    Print a table of fits for `series`, a dict of name -> (x, y).
+    """
+    print("series\tsigma\tkappa\tlambda\tpeak threads\t(low-high)")
+    for name, (x, y) in series.items():
+        params = fit(x, y)
+        if params is None:
+            print("%s\t(too few thread counts)" % name)
+            continue
+        low, high = bootstrap(rng, x, y, resamples, confidence)["peak"]
+        print(
+            "%s\t%.4g\t%.4g\t%.4g\t%.1f\t(%.1f-%.1f)"
+            % (
+                name,
+                params["sigma"],
+                params["kappa"],
+                params["lambda"],
+                params["peak"],
+                low,
+                high,
+            )
+        )
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(
+        description="Fit the Universal Scalability Law to a series selected as for slice.py."
+    )
+    ap.add_argument("--confidence", type=float, default=0.95)
+    ap.add_argument("--resamples", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("file")
+    ap.add_argument("tags", nargs="*")
+    opts = ap.parse_args()
+
+    x, y = xy(slice.iter_all(opts.file, opts.tags))
+
+    params = fit(x, y)
+    if params is None:
+        raise SystemExit("need at least three distinct thread counts to fit")
+    bounds = bootstrap(
+        np.random.default_rng(opts.seed), x, y, opts.resamples, opts.confidence
+    )
+    for k in PARAMS:
+        print("%s\t%.4g\t(%.4g-%.4g)" % (k, params[k], *bounds[k]))
@@ -0,0 +1,63 @@
+"""
+Statistics over weighted samples, where `weights[i]` is the number of
+times `values[i]` was observed.
+
+These give the same answers as the equivalent NumPy/matplotlib function
+applied to the samples expanded out, but without doing that expansion.
+"""
+
+import numpy as np
+
+
+def _sorted(values, weights):
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    order = np.argsort(values, kind="stable")
+    return values[order], weights[order]
+
+
+def percentile(values, weights, q):
+    """
+    Like `np.percentile(expanded, q)`, with linear interpolation.
+    """
+    values, weights = _sorted(values, weights)
+    # ends[i] is the index just past the last copy of values[i]
+    ends = np.cumsum(weights)
+    pos = np.asarray(q, dtype=np.float64) / 100 * (ends[-1] - 1)
+    lo = np.floor(pos)
+    hi = np.minimum(lo + 1, ends[-1] - 1)
+    lo_value = values[np.searchsorted(ends, lo, side="right")]
+    hi_value = values[np.searchsorted(ends, hi, side="right")]
+    return lo_value + (pos - lo) * (hi_value - lo_value)
+
+
+def median(values, weights):
+    return percentile(values, weights, 50)
+
+
+def mean(values, weights):
+    return np.average(values, weights=weights)
+
+
+def gaussian_kde(values, weights, coords):
+    """
+    Like matplotlib's `GaussianKDE(expanded)` (with its default Scott's
+    rule bandwidth) evaluated at `coords`.
+
+    This costs O(len(coords) * len(values)), regardless of the total
+    weight.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    coords = np.asarray(coords, dtype=np.float64)
+
+    n = weights.sum()
+    centre = np.dot(weights, values) / n
+    variance = np.dot(weights, (values - centre) ** 2) / (n - 1)
+    if variance == 0:
+        return (coords == values[0]).astype(np.float64)
+
+    bandwidth2 = variance * n ** (-2 / 5)
+    diff = coords[:, np.newaxis] - values[np.newaxis, :]
+    density = np.exp(-(diff**2) / (2 * bandwidth2)) @ weights
+    return density / (n * np.sqrt(2 * np.pi * bandwidth2))